@@ -3,18 +3,25 @@ from dotenv import load_dotenv
 import os
 import threading
 import asyncio
-from flask import Flask, redirect, url_for, jsonify
+from flask import Flask, Response, redirect, url_for, jsonify, request, g
+from flask_login import current_user
 from flask_wtf import CSRFProtect
-from firestore_config import initialize_firestore, db
-from firebase_admin import firestore
+from firestore_config import initialize_firestore
+from latest_signals import latest_signals
+from signal_stream import signal_broker
 from auth import auth, login_manager
 from dashboard import dashboard
 from forum import forum
 from news import news
+from payments import payments
 from settings import settings
-from scanner import scan_signals_once
 import logging
 
+import entitlements
+import leader
+import media
+from mail_outbox import outbox
+from paid_required import paid_required
 from user import User
 
 logging.basicConfig(level=logging.DEBUG)
@@ -32,6 +39,9 @@ if not app.secret_key:
 logger.debug("Loaded SECRET_KEY: %s", app.secret_key)
 logger.debug("Loaded PRICE_NGN: %s", os.getenv("PRICE_NGN", "0"))
 
+# Werkzeug answers 413 before reading a larger body; the spare megabyte covers the other form fields
+app.config["MAX_CONTENT_LENGTH"] = media.MAX_UPLOAD_BYTES + 1024 * 1024
+
 csrf = CSRFProtect(app)
 
 try:
@@ -41,23 +51,46 @@ except Exception as e:
     logger.error("Firebase initialization failed: %s", e)
     raise
 
-login_manager.init_app(app)
+# Deliver any email left queued by an earlier process
+outbox.start()
+# Upload any forum image left spooled by an earlier process; in the background, since it queries Firestore
+threading.Thread(target=media.resume, name="media-resume", daemon=True).start()
+
+# Templates get current_user from inject_signed_in, as a lazy proxy: Flask-Login's processor loads the user on every render
+login_manager.init_app(app, add_context_processor=False)
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'warning'
 
+async def _scan_while_leading():
+    # Imported only once this worker holds the lease: the scanner pulls in pandas, numpy, pandas_ta and
+    # deriv_api, which standby workers serving pages never need
+    from scanner import scan_signals_once
+    await scan_signals_once()
+
 def _start_scanner():
     try:
-        asyncio.run(scan_signals_once())
+        asyncio.run(leader.run_as_leader(_scan_while_leading))
     except Exception as e:
         logger.error("Scanner thread failed: %s", e)
 
-threading.Thread(target=_start_scanner, daemon=True).start()
+# Every worker stands by for the scanner lease; RUN_SCANNER=0 leaves scanning to the scanner service
+if os.getenv("RUN_SCANNER", "1") == "1":
+    threading.Thread(target=_start_scanner, daemon=True).start()
 
 app.register_blueprint(auth, url_prefix='/auth')
 app.register_blueprint(dashboard, url_prefix='/')
 app.register_blueprint(forum, url_prefix='/forum')
 app.register_blueprint(news, url_prefix='/news')
 app.register_blueprint(settings, url_prefix='/settings')
+# Paystack signs its webhooks instead of sending a CSRF token
+csrf.exempt(payments)
+app.register_blueprint(payments, url_prefix='/payments')
+
+@app.context_processor
+def inject_signed_in():
+    # Pages behind paid_required have the uid from the verified claim; only the others ask Flask-Login,
+    # whose current_user loads the user on first use
+    return {"current_user": current_user, "signed_in": "uid" in g or current_user.is_authenticated}
 
 @app.route('/')
 def home():
@@ -66,11 +99,29 @@ def home():
 # API endpoint for signals
 @app.route('/api/signals', methods=['GET'])
 def get_signals():
-    signals = [d.to_dict() for d in db.collection('signals')
-                             .order_by('time', direction=firestore.Query.DESCENDING)
-                             .limit(20)
-                             .stream()]
-    return jsonify(signals)
+    signals, etag = latest_signals.get()
+    response = jsonify(signals)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+# Live signals as Server-Sent Events, for the same paying users as the dashboard
+@app.route('/api/signals/stream', methods=['GET'])
+@paid_required
+def stream_signals():
+    if not signal_broker.connect():
+        return jsonify({"error": "Too many live connections, retry shortly"}), 503, {"Retry-After": "30"}
+    latest_signals.get()  # make sure this process is listening for new signals
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    def generate():
+        try:
+            yield from signal_broker.stream(last_event_id)
+        finally:
+            signal_broker.disconnect()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/admin/grant_access/<uid>', methods=['POST'])
 def grant_access(uid):
@@ -83,6 +134,7 @@ def grant_access(uid):
     user.code_issued = "ACCESS1234"  # Or use random code as above
     user.code_expires = user.paid_until
     user.save()
+    entitlements.revoke(uid)
 
     try:
         from auth import send_email
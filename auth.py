@@ -1,9 +1,6 @@
 import os
 import uuid
 import datetime
-import smtplib
-import requests
-from email.message import EmailMessage
 import logging
 
 from flask import (
@@ -17,8 +14,12 @@ from flask_login import (
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from werkzeug.security import generate_password_hash, check_password_hash
 
+import entitlements
 import firestore_config
-from user import User
+import identifiers
+import payments
+from mail_outbox import outbox
+from user import User, user_cache
 
 auth = Blueprint('auth', __name__)
 login_manager = LoginManager()
@@ -35,6 +36,25 @@ logger = logging.getLogger(__name__)
 def load_user(uid):
     return User.get(uid)
 
+def _unpaid_owner(email: str):
+    """The user document owning `email` if that user has never paid (an abandoned registration), else None."""
+    uid = identifiers.lookup(email, ('email',))
+    doc = firestore_config.db.collection('users').document(uid).get() if uid else None
+    if not doc or not doc.exists:
+        return None
+    data = doc.to_dict()
+    return doc if not data.get('has_paid') and not data.get('paid_until') else None
+
+def _release_unpaid(uid: str, email: str, username: str) -> None:
+    """Removes a registration whose payment never started, so its email and username can be used again."""
+    batch = firestore_config.db.batch()
+    identifiers.release(uid, email, username, batch=batch)
+    batch.delete(firestore_config.db.collection('users').document(uid))
+    try:
+        batch.commit()
+    except Exception as e:
+        logger.error(f"Could not release the registration of {uid}: {e}")
+
 @auth.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -43,58 +63,61 @@ def register():
             flash('Passwords do not match.', 'danger')
             return redirect(url_for('auth.register'))
 
-        uid = str(uuid.uuid4())
-        hashed = generate_password_hash(data['password'])
-        firestore_config.db.collection('users').document(uid).set({
+        # An earlier registration with this email that never paid is started over, not locked out
+        unpaid = _unpaid_owner(data['email'])
+        taken = identifiers.taken(data['email'], data['username'], uid=unpaid.id if unpaid else None)
+        if taken:
+            flash(f'That {taken} is already registered.', 'danger')
+            return redirect(url_for('auth.register'))
+
+        fields = {
             'email': data['email'],
             'username': data['username'],
             'phone': data['phone'],
-            'password': hashed,
+            'password': generate_password_hash(data['password']),
             'paid_until': None,
             'has_paid': False,
             'code_issued': None,
             'code_expires': None
-        })
-        session['reg_uid'] = uid
-        # Generate a numeric reference based on timestamp
-        reference = int(datetime.datetime.now().timestamp())
-        session['reg_reference'] = reference  # Save only numeric reference
-
-        # Initialize Paystack payment with requests
-        amount_ngn = float(data.get('amount_ngn', 15000))  # Pre-filled from form
-        amount_kobo = int(amount_ngn * 100)
-        logger.debug(f"Initializing payment with amount_ngn={amount_ngn}, amount_kobo={amount_kobo}, reference={reference}")
-        
-        url = "https://api.paystack.co/transaction/initialize"
-        headers = {
-            "Authorization": f"Bearer {os.getenv('PAYSTACK_SK')}",
-            "Content-Type": "application/json"
         }
-        payload = {
-            "amount": amount_kobo,
-            "email": data['email'],
-            "reference": str(reference),  # Convert to string as Paystack expects a string parameter
-            "callback_url": url_for("auth.verify", _external=True)
-        }
-        logger.debug(f"Paystack payload: {payload}")
-        response = requests.post(url, json=payload, headers=headers)
-        logger.debug(f"Paystack response: {response.text}")
-
-        resp_data = response.json()
-        if not resp_data.get("status"):
-            logger.error(f"Paystack init failed: {resp_data.get('message')}")
-            flash(f"Payment init failed: {resp_data.get('message', 'Unknown error')}", "danger")
-            return redirect(url_for("auth.register"))
+        if unpaid:
+            uid = unpaid.id
+            old = unpaid.to_dict()
+            try:
+                identifiers.reindex(uid, {'email': old.get('email'), 'username': old.get('username')}, data, fields)
+            except identifiers.IdentifierTaken as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('auth.register'))
+            user_cache.invalidate(uid)
+        else:
+            uid = str(uuid.uuid4())
+            batch = firestore_config.db.batch()
+            batch.set(firestore_config.db.collection('users').document(uid), fields)
+            identifiers.index(uid, data['email'], data['username'], batch=batch)
+            try:
+                batch.commit()  # the user and their identifiers are written together or not at all
+            except identifiers.AlreadyExists:
+                flash('That email or username is already registered.', 'danger')
+                return redirect(url_for('auth.register'))
+        session['reg_uid'] = uid
+        reference = payments.new_reference()
+        session['reg_reference'] = reference
 
-        auth_url = resp_data.get("data", {}).get("authorization_url")
-        if not auth_url:
-            logger.error(f"Missing authorization_url in Paystack resp: {resp_data}")
-            flash("Could not retrieve Paystack authorization URL.", "danger")
+        # The price is set on the server; the webhook checks the charge against the amount recorded here
+        logger.debug(f"Initializing payment with amount_kobo={payments.PRICE_KOBO}, reference={reference}")
+        try:
+            auth_url = payments.initialize(uid, data['email'], payments.PRICE_KOBO, reference,
+                                           url_for("auth.verify", _external=True))
+        except payments.PaystackError as e:
+            logger.error(f"Paystack init failed: {e}")
+            if not unpaid:
+                _release_unpaid(uid, data['email'], data['username'])
+            flash(f"Payment init failed: {e}", "danger")
             return redirect(url_for("auth.register"))
 
         return redirect(auth_url)  # Redirect to Paystack payment page
 
-    return render_template('register.html')
+    return render_template('register.html', amount_ngn=payments.PRICE_NGN)
 
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
@@ -102,22 +125,30 @@ def login():
         identifier = request.form['identifier']
         password = request.form['password']
 
-        query = firestore_config.db.collection('users').where('email', '==', identifier)
-        if not list(query.stream()):
-            query = firestore_config.db.collection('users').where('username', '==', identifier)
-        user_doc = next(query.stream(), None)
+        uid = identifiers.lookup(identifier)
+        user_doc = firestore_config.db.collection('users').document(uid).get() if uid else None
 
-        if not user_doc:
+        if not user_doc or not user_doc.exists:
             flash('Unknown user.', 'danger')
             return redirect(url_for('auth.login'))
 
         data = user_doc.to_dict()
         if not check_password_hash(data.get('password', ''), password):
-            flash('Incorrect password.', 'danger')
-            return redirect(url_for('auth.login'))
+            # A user whose identifier was never indexed, e.g. an email differing from another only in case
+            for other in identifiers.unindexed(identifier):
+                other_doc = firestore_config.db.collection('users').document(other).get()
+                if other != user_doc.id and other_doc.exists and \
+                        check_password_hash(other_doc.to_dict().get('password', ''), password):
+                    user_doc, data = other_doc, other_doc.to_dict()
+                    break
+            else:
+                flash('Incorrect password.', 'danger')
+                return redirect(url_for('auth.login'))
 
         user = User(user_doc.id, data)
+        user_cache.put(user)  # the next requests load the user from the cache
         login_user(user, remember=('remember' in request.form))
+        entitlements.issue(user)
         return redirect(url_for('dashboard.view'))
 
     return render_template('login.html')
@@ -126,61 +157,33 @@ def login():
 @login_required
 def logout():
     logout_user()
+    entitlements.clear()
     return redirect(url_for('auth.login'))
 
 @auth.route('/verify')
 def verify():
-    reference = session.get('reg_reference')  # Use stored numeric reference
+    # Paystack appends ?reference= to the callback; the session covers browsers that drop it
+    reference = session.get('reg_reference') or request.args.get('reference')
     if not reference:
         logger.error("No transaction reference found in session")
         flash('Verification failed: no transaction reference provided.', 'danger')
         return redirect(url_for('auth.register'))
 
-    url = "https://api.paystack.co/transaction/verify"
-    headers = {
-        "Authorization": f"Bearer {os.getenv('PAYSTACK_SK')}",
-        "Content-Type": "application/json"
-    }
-    params = {"reference": str(reference)}  # Use the numeric reference as a string
-    logger.debug(f"Verifying transaction with params: {params}")
-    response = requests.get(url, params=params, headers=headers)
-    resp_data = response.json()
-
-    logger.debug(f"Paystack verify response: {resp_data}")
-    if resp_data.get("status") and resp_data.get("data", {}).get("status") == "success":
-        uid = session.pop('reg_uid', None)
-        if not uid:
-            logger.error("No registration context found in session")
-            flash('Verification failed: no registration context.', 'danger')
-            return redirect(url_for('auth.register'))
-
-        paid_until = (datetime.datetime.utcnow() + datetime.timedelta(days=30)).isoformat()
-        firestore_config.db.collection('users').document(uid).update({
-            'paid_until': paid_until,
-            'has_paid': True,
-            'code_issued': str(uuid.uuid4())[:8],
-            'code_expires': paid_until
-        })
-
-        code = firestore_config.db.collection('users').document(uid).get().to_dict()['code_issued']
-        user_email = firestore_config.db.collection('users').document(uid).get().to_dict()['email']
-        try:
-            send_email(
-                to=user_email,
-                subject='Your ForexSignal Access Code',
-                body=f'Your 30-day access code is: {code}'
-            )
-            logger.debug(f"Email sent successfully to {user_email}")
-        except Exception as e:
-            logger.error(f"Failed to send email: {e}")
-            flash('Payment successful, but email failed to send. Contact support.', 'warning')
-
+    # The webhook settles the payment; this callback only reports what it recorded
+    payment = payments.get(reference)
+    status = payment.get('status') if payment else None
+    if status == 'success':
+        session.pop('reg_uid', None)
+        session.pop('reg_reference', None)
         flash('Payment successful! Check your email for your code.', 'success')
         return redirect(url_for('auth.login'))
-    else:
-        logger.error(f"Verification failed: {resp_data.get('message')}")
-        flash('Payment verification done. Contact +2348110249980 via Whatsapp providing your mail address to manually update your login status', 'success')
-        return redirect(url_for('auth.register'))
+    if status == 'pending':
+        flash('We are confirming your payment with Paystack. Your access code will be emailed as soon as it clears.', 'info')
+        return redirect(url_for('auth.login'))
+
+    logger.error(f"Verification failed for reference {reference}: payment status {status}")
+    flash('Payment verification done. Contact +2348110249980 via Whatsapp providing your mail address to manually update your login status', 'success')
+    return redirect(url_for('auth.register'))
 
 @auth.route('/apply_code', methods=['GET', 'POST'])
 def apply_code():
@@ -212,6 +215,9 @@ def apply_code():
             'code_issued': code,
             'code_expires': paid_until
         })
+        user_cache.invalidate(uid)
+        entitlements.revoke(uid)
+        entitlements.issue(User.get(uid))
         firestore_config.db.collection('codes').document(code).delete()
 
         flash('Access code applied successfully! Your subscription is extended.', 'success')
@@ -223,9 +229,7 @@ def apply_code():
 def forgot_password():
     if request.method == 'POST':
         email = request.form['email'].strip().lower()
-        users = firestore_config.db.collection('users').where('email', '==', email).stream()
-        user_doc = next(users, None)
-        if not user_doc:
+        if not identifiers.lookup(email, ('email',)):
             flash('No account with that email.', 'warning')
             return redirect(url_for('auth.forgot_password'))
 
@@ -260,10 +264,9 @@ def reset_password(token):
             return redirect(request.url)
 
         hashed = generate_password_hash(pw)
-        users = firestore_config.db.collection('users').where('email', '==', email).stream()
-        doc = next(users, None)
-        if doc:
-            firestore_config.db.collection('users').document(doc.id).update({'password': hashed})
+        uid = identifiers.lookup(email, ('email',))
+        if uid:
+            firestore_config.db.collection('users').document(uid).update({'password': hashed})
             flash('Password reset successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
 
@@ -273,14 +276,5 @@ def reset_password(token):
     return render_template('reset_password.html')
 
 def send_email(to: str, subject: str, body: str):
-    msg = EmailMessage()
-    msg.set_content(body)
-    msg['Subject'] = subject
-    msg['From'] = os.getenv('EMAIL_SENDER')
-    msg['To'] = to
-
-    server = smtplib.SMTP(os.getenv('SMTP_SERVER'), int(os.getenv('SMTP_PORT', 587)))
-    server.starttls()
-    server.login(os.getenv('EMAIL_USER'), os.getenv('EMAIL_PASS'))
-    server.send_message(msg)
-    server.quit()
\ No newline at end of file
+    # Queued on the outbox; background workers deliver it over pooled SMTP connections
+    outbox.enqueue(to, subject, body)
@@ -0,0 +1,243 @@
+#
+#  --- Scanner Strategy Backtester ---
+#
+#  Replays stored 5-minute candles bar by bar through the scanner's own rules
+#  (IndicatorEngine + analyze_signal_for_symbol), simulates the TP/SL exits implied
+#  by RRR and STOP_LOSS_PIPS, and reports win rate, expectancy and drawdown.
+#
+#  Usage:
+#      python backtest.py [--store candle_store/] [--start 2024-01-01] [--end 2024-12-31]
+#                         [--symbols R_10 R_25] [--min-score 3] [--workers 4]
+#      python backtest.py --data candles/ ...
+#
+#  By default candles are read from the on-disk CandleStore. --data instead points at a
+#  directory of <symbol>_300.csv files with an "epoch,open,high,low,close" header row.
+#
+
+import argparse
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+import scanner
+from candle_store import CandleStore, CANDLE_STORE_DIR
+from indicators import IndicatorEngine
+
+GRANULARITY = 300  # Backtests run on the scanner's 5-minute entry timeframe
+SWING_BARS = 50  # 2-hour bars in the Fibonacci swing, as in compute_fib_levels
+SWING_SECONDS = 7200
+CHUNK_BARS = 100_000  # Bars converted to Python floats at a time, bounding memory on long ranges
+
+
+class SwingTracker:
+    """
+    High/low of the last SWING_BARS 2-hour bars, built from 5-minute candles as they close.
+    Like the live 2-hour request, the window includes the still-forming 2-hour bar.
+    """
+
+    def __init__(self, bars: int = SWING_BARS, seconds: int = SWING_SECONDS):
+        self.seconds = seconds
+        self.completed = deque(maxlen=bars - 1)
+        self.bucket = None
+        self.hi = self.lo = math.nan
+        self.closed_hi, self.closed_lo = -math.inf, math.inf
+
+    def update(self, epoch: int, high: float, low: float) -> None:
+        bucket = epoch // self.seconds
+        if bucket != self.bucket:
+            if self.bucket is not None:
+                self.completed.append((self.hi, self.lo))
+                self.closed_hi = max(hi for hi, _ in self.completed)
+                self.closed_lo = min(lo for _, lo in self.completed)
+            self.bucket, self.hi, self.lo = bucket, high, low
+        else:
+            self.hi = max(self.hi, high)
+            self.lo = min(self.lo, low)
+
+    def swing(self) -> tuple:
+        return max(self.closed_hi, self.hi), min(self.closed_lo, self.lo)
+
+
+def load_csv_candles(path: str, start: int | None = None, end: int | None = None) -> dict:
+    """Reads an epoch,open,high,low,close CSV into column arrays, keeping start <= epoch <= end."""
+    data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    keep = np.ones(len(data), dtype=bool)
+    if start is not None:
+        keep &= data[:, 0] >= start
+    if end is not None:
+        keep &= data[:, 0] <= end
+    data = data[keep]
+    return {
+        "epoch": data[:, 0].astype(np.int64),
+        "open": data[:, 1],
+        "high": data[:, 2],
+        "low": data[:, 3],
+        "close": data[:, 4],
+    }
+
+
+def backtest_symbol(symbol: str, candles: dict, min_score: int = scanner.SAVE_TO_DB_THRESHOLD,
+                    equity: float = scanner.INITIAL_CAPITAL) -> list:
+    """
+    Walks one symbol's candles in order. A signal is evaluated at every bar close while no
+    trade is open; a trade is closed on the first later bar whose range reaches TP or SL
+    (SL is assumed to fill first when a single bar reaches both).
+    Returns: the closed trades as dictionaries.
+    """
+    engine = IndicatorEngine(scanner.MA_LONG, scanner.MA_SHORT, scanner.RSI_LEN, scanner.SMA_LEN,
+                             scanner.MACD_FAST, scanner.MACD_SLOW, scanner.MACD_SIGNAL)
+    swing = SwingTracker()
+    trades = []
+    position = None
+
+    for lo in range(0, len(candles["epoch"]), CHUNK_BARS):
+        bars = zip(*(candles[column][lo:lo + CHUNK_BARS].tolist() for column in ("epoch", "high", "low", "close")))
+        for epoch, high, low, close in bars:
+            if position:
+                buy = position["direction"] == "BUY"
+                stopped = low <= position["stop_loss"] if buy else high >= position["stop_loss"]
+                target = high >= position["tp"] if buy else low <= position["tp"]
+                if stopped or target:
+                    r_multiple = -1.0 if stopped else scanner.RRR
+                    trades.append({
+                        **position,
+                        "exit_epoch": epoch,
+                        "exit_price": position["stop_loss"] if stopped else position["tp"],
+                        "r": r_multiple,
+                        "pnl": position["stake"] * r_multiple,
+                    })
+                    position = None
+
+            engine.append(close, epoch)
+            swing.update(epoch, high, low)
+            if position or len(engine) < scanner.MIN_VALID_ROWS:
+                continue
+
+            fibs = scanner.fib_levels_from_swing(*swing.swing())
+            signal = scanner.analyze_signal_for_symbol(engine, fibs, equity, symbol)
+            if signal and signal["score"] >= min_score:
+                position = {
+                    "symbol": symbol,
+                    "direction": signal["direction"],
+                    "score": signal["score"],
+                    "entry_epoch": epoch,
+                    "entry_price": signal["entry_price"],
+                    "tp": signal["tp"],
+                    "stop_loss": signal["stop_loss"],
+                    "stake": signal["stake"],
+                }
+
+    return trades
+
+
+def summarize(trades: list, equity: float = scanner.INITIAL_CAPITAL) -> dict:
+    """Win rate, expectancy (in R multiples) and maximum drawdown of a set of trades."""
+    trades = sorted(trades, key=lambda t: t["exit_epoch"])
+    wins = sum(1 for t in trades if t["r"] > 0)
+
+    balance = peak = equity
+    max_drawdown = max_drawdown_pct = 0.0
+    for trade in trades:
+        balance += trade["pnl"]
+        peak = max(peak, balance)
+        max_drawdown = max(max_drawdown, peak - balance)
+        max_drawdown_pct = max(max_drawdown_pct, (peak - balance) / peak)
+
+    total_r = sum(t["r"] for t in trades)
+    return {
+        "trades": len(trades),
+        "wins": wins,
+        "losses": len(trades) - wins,
+        "win_rate": wins / len(trades) if trades else 0.0,
+        "expectancy_r": total_r / len(trades) if trades else 0.0,
+        "total_r": total_r,
+        "net_pnl": balance - equity,
+        "max_drawdown": max_drawdown,
+        "max_drawdown_pct": max_drawdown_pct,
+    }
+
+
+def _backtest_job(args: tuple) -> tuple:
+    """Process-pool entry point: loads and backtests one symbol."""
+    symbol, source, start, end, min_score = args
+    if source.endswith(".csv"):
+        candles = load_csv_candles(source, start, end)
+    else:
+        # Memory-mapped columns: only the requested range is ever paged in
+        candles = CandleStore(source).read(symbol, GRANULARITY, start, end)
+    return symbol, len(candles["epoch"]), backtest_symbol(symbol, candles, min_score)
+
+
+def run_backtest(symbols: list, min_score: int, workers: int, data_dir: str | None = None,
+                 store_dir: str = CANDLE_STORE_DIR, start: int | None = None, end: int | None = None) -> dict:
+    """
+    Backtests every symbol with stored candles, spread over `workers` processes.
+    Candles come from CSV files in `data_dir` if given, otherwise from the CandleStore at `store_dir`.
+    """
+    jobs = []
+    store = CandleStore(store_dir)
+    for symbol in symbols:
+        if data_dir:
+            path = os.path.join(data_dir, f"{symbol}_{GRANULARITY}.csv")
+            if os.path.exists(path):
+                jobs.append((symbol, path, start, end, min_score))
+                continue
+        elif store.last_epoch(symbol, GRANULARITY) is not None:
+            jobs.append((symbol, store_dir, start, end, min_score))
+            continue
+        scanner.logger.warning(f"No stored candles for {symbol}; skipping.")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_backtest_job, jobs))
+
+    all_trades = [trade for _, _, trades in results for trade in trades]
+    return {
+        "bars": sum(bars for _, bars, _ in results),
+        "symbols": {symbol: summarize(trades) for symbol, _, trades in results},
+        "overall": summarize(all_trades),
+        "trades": all_trades,
+    }
+
+
+def print_report(report: dict, elapsed: float) -> None:
+    print(f"{'Symbol':<12}{'Trades':>8}{'Win %':>8}{'Exp (R)':>9}{'Net PnL':>15}{'Max DD %':>10}")
+    rows = list(report["symbols"].items()) + [("ALL", report["overall"])]
+    for symbol, s in rows:
+        print(f"{symbol:<12}{s['trades']:>8}{s['win_rate'] * 100:>8.1f}{s['expectancy_r']:>9.2f}"
+              f"{s['net_pnl']:>15.2f}{s['max_drawdown_pct'] * 100:>10.1f}")
+    print(f"\n{report['bars']:,} bars in {elapsed:.1f}s ({report['bars'] / max(elapsed, 1e-9):,.0f} bars/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the scanner strategy on stored candles.")
+    parser.add_argument("--data", help="Directory of <symbol>_300.csv candle files (instead of the store)")
+    parser.add_argument("--store", default=CANDLE_STORE_DIR, help="CandleStore directory")
+    parser.add_argument("--start", help="First day to replay (YYYY-MM-DD, UTC)")
+    parser.add_argument("--end", help="Last day to replay (YYYY-MM-DD, UTC)")
+    parser.add_argument("--symbols", nargs="*", default=scanner.SYMBOLS)
+    parser.add_argument("--min-score", type=int, default=scanner.SAVE_TO_DB_THRESHOLD,
+                        help="Lowest signal score that opens a trade")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--json", help="Also write the full report, including trades, to this file")
+    args = parser.parse_args()
+
+    def day_epoch(day: str | None, end_of_day: bool = False) -> int | None:
+        if not day:
+            return None
+        epoch = int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+        return epoch + 86399 if end_of_day else epoch
+
+    started = time.perf_counter()
+    report = run_backtest(args.symbols, args.min_score, args.workers, data_dir=args.data, store_dir=args.store,
+                          start=day_epoch(args.start), end=day_epoch(args.end, end_of_day=True))
+    print_report(report, time.perf_counter() - started)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
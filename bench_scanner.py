@@ -0,0 +1,239 @@
+#
+#  --- Scanner Benchmarks ---
+#
+#  Times the scanner's hot paths on synthetic candle sets and records time, peak
+#  memory and allocations per benchmark and symbol count:
+#
+#      fetch_live_candles[seed]   first fetch: full history into a fresh buffer + DataFrame
+#      fetch_live_candles[update] later fetches: incremental request merged into the buffer
+#      compute_indicators         pandas_ta indicator frame for every symbol
+#      analyze_signal_for_symbol  signal rules over precomputed indicator frames
+#      scan_cycle[<mode>]         a full cycle against the in-process fake Deriv API
+#
+#  Usage:
+#      python bench_scanner.py [--sizes 37 500 5000] [--repeat 3] [--modes incremental batch pandas]
+#      python bench_scanner.py --save-baseline          # record this run as bench_baseline.json
+#      python bench_scanner.py --check [--tolerance 0.2] # fail if slower than the baseline (or there is none)
+#
+#  Every run is appended to bench_results.jsonl with the current git commit, so results
+#  can be compared between commits; bench_baseline.json is meant to be committed. The
+#  committed baseline leaves out compute_indicators and scan_cycle[pandas]: record those
+#  with the real pandas_ta installed, never a stand-in.
+#
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import scanner
+from fake_deriv import FakeDeriv, FakeDerivAPI, synthetic_symbols
+
+RESULTS_FILE = "bench_results.jsonl"
+BASELINE_FILE = "bench_baseline.json"
+
+
+class ArrayCandles:
+    """Precomputed random-walk candles per symbol, so generating data stays out of the measurements."""
+
+    def __init__(self, symbols: list, granularities: dict, seed: int = 7):
+        rng = np.random.default_rng(seed)
+        now = int(time.time())
+        self.bars = {}
+        for symbol in symbols:
+            for granularity, count in granularities.items():
+                last_open = now - now % granularity
+                epochs = last_open - granularity * np.arange(count - 1, -1, -1)
+                closes = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.001, count)))
+                opens = np.r_[closes[0], closes[:-1]]
+                spread = np.abs(rng.normal(0, 0.0005, count))
+                self.bars[(symbol, granularity)] = [
+                    {"epoch": e, "open": o, "high": max(o, c) + s, "low": min(o, c) - s, "close": c}
+                    for e, o, c, s in zip(epochs.tolist(), opens.tolist(), closes.tolist(), spread.tolist())
+                ]
+        self.epochs = {key: [c["epoch"] for c in bars] for key, bars in self.bars.items()}
+
+    def candles_for(self, symbol: str, granularity: int) -> list:
+        return self.bars[(symbol, granularity)]
+
+    def candles(self, symbol: str, granularity: int, start: int, end: int, now: int) -> list:
+        key = (symbol, granularity)
+        lo = bisect.bisect_left(self.epochs[key], start)
+        hi = bisect.bisect_right(self.epochs[key], min(end, now))
+        return self.bars[key][lo:hi]
+
+
+def reset_scanner_state() -> None:
+    scanner.candle_cache.clear()
+    scanner.candle_cache.store = None  # benchmarks never touch the on-disk store
+    scanner.indicator_engines.clear()
+
+
+def measure(func, repeat: int) -> dict:
+    """Runs `func` (which may return a coroutine) `repeat` times for timing, then once under tracemalloc."""
+    def run():
+        result = func()
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return {
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "peak_bytes": peak,
+        "alloc_blocks": allocations,
+    }
+
+
+def bench_fetch(symbols: list, source: ArrayCandles, repeat: int) -> dict:
+    api = FakeDerivAPI(FakeDeriv(source))
+    count = scanner.CANDLE_WINDOW
+
+    async def fetch_all():
+        for symbol in symbols:
+            await scanner.fetch_live_candles(api, symbol, 300, count)
+
+    def seed():
+        reset_scanner_state()
+        return fetch_all()
+
+    results = {"fetch_live_candles[seed]": measure(seed, repeat)}
+    reset_scanner_state()
+    asyncio.run(fetch_all())
+    results["fetch_live_candles[update]"] = measure(fetch_all, repeat)
+    return results
+
+
+def bench_indicators(symbols: list, source: ArrayCandles, repeat: int) -> dict:
+    def frame(symbol: str, granularity: int) -> pd.DataFrame:
+        df = pd.DataFrame(source.candles_for(symbol, granularity))
+        df["epoch"] = pd.to_datetime(df["epoch"], unit="s")
+        return df.set_index("epoch")
+
+    frames = {symbol: (frame(symbol, 7200), frame(symbol, 300)) for symbol in symbols}
+    computed = {symbol: scanner.compute_indicators(*frames[symbol]) for symbol in symbols}
+
+    def compute_all():
+        for df2h, df5m in frames.values():
+            scanner.compute_indicators(df2h, df5m)
+
+    def analyze_all():
+        for symbol, (df, fibs) in computed.items():
+            scanner.analyze_signal_for_symbol(df, fibs, scanner.INITIAL_CAPITAL, symbol)
+
+    return {
+        "compute_indicators": measure(compute_all, repeat),
+        "analyze_signal_for_symbol": measure(analyze_all, repeat),
+    }
+
+
+def bench_scan_cycle(symbols: list, source: ArrayCandles, repeat: int, modes: list) -> dict:
+    api = FakeDerivAPI(FakeDeriv(source))
+    results = {}
+    for mode in modes:
+        scanner.INDICATOR_MODE = mode
+        reset_scanner_state()
+        asyncio.run(scanner.scan_cycle(api, symbols))  # warm the candle buffers and engines
+        results[f"scan_cycle[{mode}]"] = measure(lambda: scanner.scan_cycle(api, symbols), repeat)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes: list, repeat: int, modes: list) -> list:
+    records = []
+    commit = git_commit()
+    stamp = datetime.now(timezone.utc).isoformat()
+    for size in sizes:
+        symbols = synthetic_symbols(size)
+        source = ArrayCandles(symbols, {300: scanner.CANDLE_WINDOW, 7200: 50})
+        results = {}
+        results.update(bench_fetch(symbols, source, repeat))
+        results.update(bench_indicators(symbols, source, repeat))
+        results.update(bench_scan_cycle(symbols, source, repeat, modes))
+        for name, stats in results.items():
+            record = {"commit": commit, "time": stamp, "python": sys.version.split()[0],
+                      "benchmark": name, "symbols": size, **stats}
+            records.append(record)
+            print(f"{name:<30}{size:>6} symbols  {stats['seconds_median'] * 1000:>10.1f} ms  "
+                  f"peak {stats['peak_bytes'] / 1e6:>8.1f} MB  {stats['alloc_blocks']:>9} blocks")
+    return records
+
+
+def check(records: list, baseline_path: str, tolerance: float) -> bool:
+    """
+    Compares median times against the baseline; returns False if anything regressed past `tolerance`
+    or there is no baseline to compare with.
+    """
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; record one with --save-baseline.")
+        return False
+    with open(baseline_path) as f:
+        baseline = {(r["benchmark"], r["symbols"]): r for r in json.load(f)}
+    ok = True
+    for record in records:
+        base = baseline.get((record["benchmark"], record["symbols"]))
+        if not base:
+            print(f"{record['benchmark']:<30}{record['symbols']:>6} symbols  no baseline")
+            continue
+        ratio = record["seconds_median"] / base["seconds_median"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        ok &= flag == "ok"
+        print(f"{record['benchmark']:<30}{record['symbols']:>6} symbols  x{ratio:.2f} vs {base['commit']}  {flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scanner on synthetic candles.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[37, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", nargs="*", default=["incremental", "batch", "pandas"],
+                        help="SCAN_INDICATORS modes to run full cycles with")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write this run to {BASELINE_FILE}")
+    parser.add_argument("--check", action="store_true", help=f"Compare this run against {BASELINE_FILE}")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before --check fails")
+    args = parser.parse_args()
+
+    scanner.logger.setLevel("WARNING")
+    records = run(args.sizes, args.repeat, args.modes)
+
+    with open(args.output, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(records, f, indent=2)
+
+    if args.check and not check(records, BASELINE_FILE, args.tolerance):
+        sys.exit(1)
@@ -0,0 +1,162 @@
+#
+#  --- Web Startup Benchmarks ---
+#
+#  Measures what a web worker pays to boot: each run imports the entry module in a
+#  fresh interpreter and records the import time, peak RSS and number of modules
+#  loaded, and which of the scanner's heavy dependencies (HEAVY_MODULES) came with it.
+#  The scanner thread is disabled (RUN_SCANNER=0) unless --with-scanner is given.
+#  Needs the same environment as the app itself (SECRET_KEY, FIREBASE_CONFIG_JSON).
+#
+#  Usage:
+#      python bench_startup.py [--repeat 5] [--module app]
+#      python bench_startup.py --profile [--top 25]       # python -X importtime, summed per package
+#      python bench_startup.py --save-baseline            # record this run as startup_baseline.json
+#      python bench_startup.py --check [--tolerance 0.2]  # fail if slower/bigger than the baseline
+#                                                         # or if a heavy module is imported (or there is no baseline)
+#
+#  Every run is appended to bench_results.jsonl with the current git commit.
+#
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+RESULTS_FILE = "bench_results.jsonl"
+BASELINE_FILE = "startup_baseline.json"
+# Scanner and analytics dependencies a web worker should not import
+HEAVY_MODULES = ("pandas", "numpy", "pandas_ta", "deriv_api", "bs4", "PIL")
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "modules": len(sys.modules),
+    "heavy": sorted(name for name in {heavy!r} if name in sys.modules),
+}}))
+"""
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _env(with_scanner: bool) -> dict:
+    env = dict(os.environ)
+    if not with_scanner:
+        env["RUN_SCANNER"] = "0"
+    return env
+
+
+def measure(module: str, repeat: int, with_scanner: bool) -> dict:
+    """Imports `module` in `repeat` fresh interpreters. Returns median time/RSS and the heavy modules seen."""
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", CHILD.format(module=module, heavy=HEAVY_MODULES)],
+                              capture_output=True, text=True, env=_env(with_scanner))
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds_median": statistics.median(r["seconds"] for r in runs),
+        "seconds_min": min(r["seconds"] for r in runs),
+        "rss_bytes": statistics.median(r["rss_bytes"] for r in runs),
+        "modules": runs[-1]["modules"],
+        "heavy": runs[-1]["heavy"],
+        "repeat": repeat,
+    }
+
+
+def profile(module: str, top: int, with_scanner: bool) -> None:
+    """Prints the packages and modules that cost the most import time, from python -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, env=_env(with_scanner))
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    per_package = defaultdict(int)
+    cumulative = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        per_package[name.split(".")[0]] += int(self_us)
+        cumulative.append((int(cumulative_us), name))
+
+    total = sum(per_package.values())
+    print(f"import {module}: {total / 1000:.0f} ms in {len(cumulative)} modules\n")
+    print(f"{'package':<30}{'self ms':>10}{'share':>8}")
+    for name, us in sorted(per_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:<30}{us / 1000:>10.1f}{us / total:>8.1%}")
+    print(f"\n{'module (cumulative)':<50}{'ms':>10}")
+    for us, name in sorted(cumulative, reverse=True)[:top]:
+        print(f"{name:<50}{us / 1000:>10.1f}")
+
+
+def check(record: dict, baseline_path: str, tolerance: float) -> bool:
+    """
+    False if a heavy module is imported, time or RSS regressed past `tolerance` of the baseline,
+    or there is no baseline to compare with.
+    """
+    ok = True
+    if record["heavy"]:
+        print(f"REGRESSION: importing {record['benchmark']} loads {', '.join(record['heavy'])}")
+        ok = False
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; record one with --save-baseline.")
+        return False
+    with open(baseline_path) as f:
+        base = json.load(f)
+    for key in ("seconds_median", "rss_bytes"):
+        ratio = record[key] / base[key]
+        flag = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        ok &= flag == "ok"
+        print(f"{record['benchmark']} {key:<16} x{ratio:.2f} vs {base['commit']}  {flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark web worker startup.")
+    parser.add_argument("--module", default="app", help="Entry module to import")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--with-scanner", action="store_true", help="Leave RUN_SCANNER as configured")
+    parser.add_argument("--profile", action="store_true", help="Print an import-time profile instead")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write this run to {BASELINE_FILE}")
+    parser.add_argument("--check", action="store_true", help=f"Compare this run against {BASELINE_FILE}")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before --check fails")
+    args = parser.parse_args()
+
+    if args.profile:
+        profile(args.module, args.top, args.with_scanner)
+        sys.exit(0)
+
+    stats = measure(args.module, args.repeat, args.with_scanner)
+    record = {"commit": git_commit(), "time": datetime.now(timezone.utc).isoformat(),
+              "python": sys.version.split()[0], "benchmark": f"startup[{args.module}]", **stats}
+    print(f"import {args.module}: {stats['seconds_median'] * 1000:.0f} ms median, "
+          f"peak RSS {stats['rss_bytes'] / 1e6:.1f} MB, {stats['modules']} modules, "
+          f"heavy: {', '.join(stats['heavy']) or 'none'}")
+
+    with open(args.output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(record, f, indent=2)
+
+    if args.check and not check(record, BASELINE_FILE, args.tolerance):
+        sys.exit(1)
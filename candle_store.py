@@ -0,0 +1,259 @@
+#
+#  --- Columnar Candle Store ---
+#
+#  Append-only on-disk history of closed candles, one directory per symbol and
+#  granularity, holding one fixed-width file per column:
+#
+#      <root>/<symbol>/<granularity>/epoch.i8   (int64 epoch seconds)
+#      <root>/<symbol>/<granularity>/open.f8    (float64), high.f8, low.f8, close.f8
+#
+#  Reads memory-map the column files, so a range query only touches the pages it
+#  returns. Writers hold an exclusive flock on <root>/<symbol>/<granularity>/.lock, so
+#  the scanner and a backfill can write the same series at once; readers hold it shared
+#  while they size and map the columns, so they never see a rewrite half done (their
+#  maps stay valid afterwards, as a rewrite replaces the files). Backfill fills any
+#  missing bars, including gaps inside the stored range (e.g. scanner downtime),
+#  that fall while the symbol's market was open. Usage:
+#      python candle_store.py backfill --days 365 [--symbols R_10 frxEURUSD] [--granularity 300]
+#      python candle_store.py info
+#
+
+import argparse
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import numpy as np
+from dotenv import load_dotenv
+
+from candles import PRICE_FIELDS
+
+load_dotenv()
+
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", "candle_store")
+
+COLUMNS = {"epoch": np.dtype("<i8"), **{field: np.dtype("<f8") for field in PRICE_FIELDS}}
+
+logger = logging.getLogger(__name__)
+
+
+class CandleStore:
+    """Append-only columnar store of closed candles."""
+
+    def __init__(self, root: str = CANDLE_STORE_DIR):
+        self.root = root
+
+    def _dir(self, symbol: str, granularity: int) -> str:
+        return os.path.join(self.root, symbol, str(granularity))
+
+    def _path(self, symbol: str, granularity: int, column: str) -> str:
+        return os.path.join(self._dir(symbol, granularity), f"{column}.{COLUMNS[column].kind}8")
+
+    @contextmanager
+    def _locked(self, symbol: str, granularity: int, shared: bool = False):
+        """Holds the series' lock: exclusive for writers, shared for readers opening the columns."""
+        os.makedirs(self._dir(symbol, granularity), exist_ok=True)
+        fd = os.open(os.path.join(self._dir(symbol, granularity), ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # closing the descriptor releases the lock
+
+    def _rows(self, symbol: str, granularity: int) -> int:
+        """Complete rows on disk; a write interrupted between columns leaves some columns longer."""
+        sizes = []
+        for column, dtype in COLUMNS.items():
+            path = self._path(symbol, granularity, column)
+            sizes.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _repair(self, symbol: str, granularity: int) -> int:
+        """Truncates every column to the number of complete rows. Only called with the write lock held."""
+        rows = self._rows(symbol, granularity)
+        for column, dtype in COLUMNS.items():
+            path = self._path(symbol, granularity, column)
+            if os.path.exists(path) and os.path.getsize(path) != rows * dtype.itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * dtype.itemsize)
+        return rows
+
+    def _last_epoch(self, symbol: str, granularity: int, rows: int) -> int | None:
+        if not rows:
+            return None
+        with open(self._path(symbol, granularity, "epoch"), "rb") as f:
+            f.seek((rows - 1) * COLUMNS["epoch"].itemsize)
+            return int(np.frombuffer(f.read(COLUMNS["epoch"].itemsize), dtype=COLUMNS["epoch"])[0])
+
+    def last_epoch(self, symbol: str, granularity: int) -> int | None:
+        if not os.path.isdir(self._dir(symbol, granularity)):
+            return None
+        with self._locked(symbol, granularity, shared=True):
+            return self._last_epoch(symbol, granularity, self._rows(symbol, granularity))
+
+    def append(self, symbol: str, granularity: int, columns: dict) -> int:
+        """
+        Appends closed candles given as column arrays. Rows at or before the last stored epoch
+        are skipped, so overlapping writes, from this or another process, are harmless.
+        Returns: the number of rows written.
+        """
+        epochs = np.asarray(columns["epoch"], dtype=COLUMNS["epoch"])
+        with self._locked(symbol, granularity):
+            # Re-read under the lock: another process may have appended since we last looked
+            last = self._last_epoch(symbol, granularity, self._repair(symbol, granularity))
+            start = 0 if last is None else int(np.searchsorted(epochs, last, side="right"))
+            if start >= len(epochs):
+                return 0
+            return self._append_rows(symbol, granularity, columns, start)
+
+    def insert(self, symbol: str, granularity: int, columns: dict) -> int:
+        """
+        Stores closed candles that may fall anywhere in the series, e.g. to fill a gap.
+        Candles past the end are appended; otherwise the columns are rewritten in epoch order,
+        keeping the stored row wherever an epoch exists already.
+        Returns: the number of rows added.
+        """
+        epochs = np.asarray(columns["epoch"], dtype=COLUMNS["epoch"])
+        with self._locked(symbol, granularity):
+            last = self._last_epoch(symbol, granularity, self._repair(symbol, granularity))
+            if last is None or epochs[0] > last:
+                return self._append_rows(symbol, granularity, columns, 0)
+
+            stored = {column: np.array(values) for column, values in self._read(symbol, granularity).items()}
+            new = ~np.isin(epochs, stored["epoch"])
+            if not new.any():
+                return 0
+            order = np.argsort(np.concatenate([stored["epoch"], epochs[new]]), kind="stable")
+            # Write every column aside first, then swap them in with the epochs last
+            for column in (*PRICE_FIELDS, "epoch"):
+                merged = np.concatenate([stored[column], np.asarray(columns[column], dtype=COLUMNS[column])[new]])
+                with open(self._path(symbol, granularity, column) + ".tmp", "wb") as f:
+                    f.write(merged[order].tobytes())
+            for column in (*PRICE_FIELDS, "epoch"):
+                path = self._path(symbol, granularity, column)
+                os.replace(path + ".tmp", path)
+            return int(new.sum())
+
+    def _append_rows(self, symbol: str, granularity: int, columns: dict, start: int) -> int:
+        """Appends rows `start:` of `columns`. Only called with the write lock held."""
+        # Epochs go last: a row only counts once every column has it
+        for column in (*PRICE_FIELDS, "epoch"):
+            values = np.asarray(columns[column], dtype=COLUMNS[column])[start:]
+            with open(self._path(symbol, granularity, column), "ab") as f:
+                f.write(values.tobytes())
+        return len(columns["epoch"]) - start
+
+    def gaps(self, symbol: str, granularity: int, start: int, end: int, is_open=None) -> list:
+        """
+        Bars between `start` and `end` (open epochs) that are not stored, merged into (first, last) ranges.
+        Bars for which `is_open(epoch)` is False, e.g. weekends, are not counted as missing.
+        """
+        first = -(-start // granularity) * granularity
+        expected = np.arange(first, end + 1, granularity, dtype=COLUMNS["epoch"])
+        missing = np.setdiff1d(expected, self.read(symbol, granularity, start, end)["epoch"], assume_unique=True)
+        if is_open is not None:
+            missing = missing[[is_open(int(epoch)) for epoch in missing]]
+        if not len(missing):
+            return []
+        breaks = np.flatnonzero(np.diff(missing) > granularity)
+        firsts = np.concatenate([missing[:1], missing[breaks + 1]])
+        lasts = np.concatenate([missing[breaks], missing[-1:]])
+        return [(int(a), int(b)) for a, b in zip(firsts, lasts)]
+
+    def read(self, symbol: str, granularity: int, start: int | None = None, end: int | None = None) -> dict:
+        """
+        Returns candles with start <= epoch <= end as memory-mapped column arrays (no copies).
+        Arrays are empty when nothing is stored.
+        """
+        if not os.path.isdir(self._dir(symbol, granularity)):
+            return self._read(symbol, granularity, start, end)
+        with self._locked(symbol, granularity, shared=True):
+            return self._read(symbol, granularity, start, end)
+
+    def _read(self, symbol: str, granularity: int, start: int | None = None, end: int | None = None) -> dict:
+        """read() for callers that already hold the series' lock."""
+        rows = self._rows(symbol, granularity)
+        if not rows:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+
+        maps = {
+            column: np.memmap(self._path(symbol, granularity, column), dtype=dtype, mode="r", shape=(rows,))
+            for column, dtype in COLUMNS.items()
+        }
+        lo = 0 if start is None else int(np.searchsorted(maps["epoch"], start, side="left"))
+        hi = rows if end is None else int(np.searchsorted(maps["epoch"], end, side="right"))
+        return {column: values[lo:hi] for column, values in maps.items()}
+
+    def tail(self, symbol: str, granularity: int, count: int) -> dict:
+        """Returns the most recent `count` stored candles."""
+        candles = self.read(symbol, granularity)
+        return {column: values[-count:] for column, values in candles.items()}
+
+    def symbols(self, granularity: int) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(s for s in os.listdir(self.root) if os.path.isdir(self._dir(s, granularity)))
+
+
+async def backfill(store: CandleStore, symbols: list, granularity: int, days: int) -> None:
+    """
+    Downloads whatever is missing from the last `days` of history per symbol from the Deriv API,
+    5,000 candles per request: older history, newer bars and gaps inside the stored range.
+    """
+    from scanner import connect_api, FETCH_TIMEOUT
+    import market_sessions
+
+    api = await connect_api()
+    now = int(time.time())
+    closed_before = now - now % granularity  # the bar containing `now` is still forming
+    for symbol in symbols:
+        # Holidays are not modelled, so their bars are asked for again on every run and come back empty
+        ranges = store.gaps(symbol, granularity, now - days * 86400, closed_before - granularity,
+                            partial(market_sessions.is_open, symbol))
+        written = 0
+        for first, last in ranges:
+            start = first
+            while start <= last:
+                end = min(start + 5000 * granularity - 1, last + granularity - 1)
+                resp = await asyncio.wait_for(api.send({
+                    "ticks_history": symbol,
+                    "style": "candles",
+                    "granularity": granularity,
+                    "start": start,
+                    "end": end,
+                }), timeout=FETCH_TIMEOUT)
+                candles = [c for c in resp.get("candles", []) if start <= c["epoch"] <= end]
+                if candles:
+                    written += store.insert(symbol, granularity, {
+                        column: [c[column] for c in candles] for column in COLUMNS
+                    })
+                start = end + 1
+        logger.info(f"{symbol}: stored {written} new {granularity}s candles from {len(ranges)} missing ranges.")
+    await api.disconnect()
+
+
+if __name__ == "__main__":
+    from scanner import SYMBOLS
+
+    parser = argparse.ArgumentParser(description="Manage the on-disk candle store.")
+    parser.add_argument("command", choices=["backfill", "info"])
+    parser.add_argument("--symbols", nargs="*", default=SYMBOLS)
+    parser.add_argument("--granularity", type=int, default=300)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--root", default=CANDLE_STORE_DIR)
+    args = parser.parse_args()
+
+    store = CandleStore(args.root)
+    if args.command == "backfill":
+        asyncio.run(backfill(store, args.symbols, args.granularity, args.days))
+    else:
+        for symbol in store.symbols(args.granularity):
+            candles = store.read(symbol, args.granularity)
+            if len(candles["epoch"]):
+                print(f"{symbol:<12}{len(candles['epoch']):>10} candles  "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.gmtime(candles['epoch'][0]))} -> "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.gmtime(candles['epoch'][-1]))}")
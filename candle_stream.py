@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+
+from deriv_api import DerivAPI
+from websockets.exceptions import ConnectionClosed
+
+from candles import CandleCache, PRICE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class CandleStream:
+    """
+    Streams live candles for many symbols over a single Deriv connection.
+
+    Every symbol gets a `ticks_history` subscription with `style: candles`. The initial history and
+    each `ohlc` update are merged into the shared CandleCache, so polling can pick up where the
+    stream left off. When an update opens a new bar, the previous bar has closed and
+    `on_close(symbol, epoch)` is called with the closed bar's open epoch.
+    """
+
+    def __init__(self, api: DerivAPI, symbols: list, granularity: int, cache: CandleCache, size: int,
+                 on_close, stale_after: float = 90):
+        self.api = api
+        self.symbols = symbols
+        self.granularity = granularity
+        self.cache = cache
+        self.size = size
+        self.on_close = on_close
+        self.stale_after = stale_after
+        self.last_message = time.monotonic()
+        self._subscriptions = []
+        self._sanity = None
+        self._dropped = asyncio.Event()
+
+    async def start(self) -> None:
+        """
+        Opens one subscription per symbol. A symbol that cannot be subscribed (e.g. its market is closed)
+        is logged and skipped; only if every symbol fails is the stream considered unavailable.
+        """
+        self._sanity = self.api.sanity_errors.subscribe(on_next=self._on_sanity_error)
+        for symbol in self.symbols:
+            try:
+                source = await self.api.subscribe({
+                    "ticks_history": symbol,
+                    "style": "candles",
+                    "granularity": self.granularity,
+                    "count": self.size,
+                    "end": "latest",
+                    "adjust_start_time": 1,
+                })
+            except ConnectionClosed:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not subscribe to candles for {symbol}: {e}")
+                continue
+            self._subscriptions.append(source.subscribe(
+                on_next=lambda resp, s=symbol: self._on_message(s, resp),
+                on_error=lambda err, s=symbol: self._on_error(s, err),
+            ))
+        if not self._subscriptions:
+            raise RuntimeError(f"No candle subscription succeeded for {len(self.symbols)} symbols")
+        self.last_message = time.monotonic()
+
+    async def wait_dropped(self) -> None:
+        """Returns once the connection closes or no update has arrived for `stale_after` seconds."""
+        while not self._dropped.is_set():
+            try:
+                await asyncio.wait_for(self._dropped.wait(), timeout=self.stale_after)
+            except asyncio.TimeoutError:
+                if time.monotonic() - self.last_message >= self.stale_after:
+                    logger.warning(f"No candle updates for {self.stale_after:.0f}s; treating the stream as dropped.")
+                    self._dropped.set()
+
+    async def stop(self) -> None:
+        """Disposes all subscriptions and closes the connection."""
+        for subscription in self._subscriptions:
+            subscription.dispose()
+        self._subscriptions.clear()
+        if self._sanity:
+            self._sanity.dispose()
+            self._sanity = None
+        try:
+            await asyncio.wait_for(self.api.disconnect(), timeout=5)
+        except Exception as e:
+            logger.debug(f"Error while closing the candle stream: {e}")
+
+    def _on_message(self, symbol: str, resp: dict) -> None:
+        self.last_message = time.monotonic()
+        buffer = self.cache.buffer(symbol, self.granularity, self.size)
+
+        if "candles" in resp:
+            buffer.merge(resp["candles"])
+            self.cache.record(buffer)
+            return
+
+        ohlc = resp.get("ohlc")
+        if not ohlc:
+            return
+
+        previous = buffer.last_epoch
+        candle = {"epoch": int(ohlc["open_time"])}
+        candle.update({field: float(ohlc[field]) for field in PRICE_FIELDS})
+        _, appended = buffer.merge([candle])
+        if appended and previous is not None:
+            self.cache.record(buffer)
+            self.on_close(symbol, previous)
+
+    def _on_error(self, symbol: str, err: Exception) -> None:
+        # A single symbol failing (e.g. market closed) does not take the other subscriptions down
+        logger.warning(f"Candle subscription for {symbol} ended: {err}")
+
+    def _on_sanity_error(self, err: Exception) -> None:
+        if isinstance(err, ConnectionClosed):
+            logger.warning(f"Deriv connection closed: {err}")
+            self._dropped.set()
@@ -0,0 +1,148 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns kept for every candle, in the order they are stored.
+PRICE_FIELDS = ("open", "high", "low", "close")
+
+
+class CandleBuffer:
+    """
+    Rolling window of the most recent candles for one (symbol, granularity) pair.
+
+    The buffer is seeded once with the full history. After that only candles at or after
+    the last stored epoch are requested: the still-forming bar is revised in place and
+    newly closed bars are appended, dropping the oldest ones to keep `size` rows.
+    """
+
+    def __init__(self, symbol: str, granularity: int, size: int):
+        self.symbol = symbol
+        self.granularity = granularity
+        self.size = size
+        self.epoch = np.empty(0, dtype=np.int64)
+        self.prices = {field: np.empty(0, dtype=np.float64) for field in PRICE_FIELDS}
+        self._frame = None
+
+    def __len__(self) -> int:
+        return len(self.epoch)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.epoch) == 0
+
+    @property
+    def last_epoch(self) -> int | None:
+        return int(self.epoch[-1]) if len(self.epoch) else None
+
+    def needs_seed(self, now: float | None = None) -> bool:
+        """True when the buffer is empty or has fallen too far behind to catch up incrementally."""
+        if self.empty:
+            return True
+        now = time.time() if now is None else now
+        return (now - self.last_epoch) / self.granularity >= self.size
+
+    def next_request(self, now: float | None = None) -> dict:
+        """Builds the ticks_history request that brings this buffer up to date."""
+        now = time.time() if now is None else now
+        req = {
+            "ticks_history": self.symbol,
+            "style": "candles",
+            "granularity": self.granularity,
+            "count": self.size,
+        }
+        if self.needs_seed(now):
+            req.update({"end": int(now), "adjust_start_time": 1})
+        else:
+            # Starting at the last stored bar returns it again, so its final values get picked up
+            req.update({"start": self.last_epoch, "end": "latest"})
+        return req
+
+    def merge(self, candles: list) -> tuple:
+        """
+        Folds API candles into the buffer.
+        Returns: (revised, appended) - whether the last stored bar changed, and how many bars were added.
+        """
+        if not candles:
+            return False, 0
+
+        candles = sorted(candles, key=lambda c: c["epoch"])
+        last = self.last_epoch
+        revised = False
+        fresh = []
+        for candle in candles:
+            epoch = int(candle["epoch"])
+            if last is not None and epoch < last:
+                continue
+            if last is not None and epoch == last:
+                for field in PRICE_FIELDS:
+                    value = float(candle[field])
+                    if self.prices[field][-1] != value:
+                        self.prices[field][-1] = value
+                        revised = True
+                continue
+            fresh.append(candle)
+
+        if fresh:
+            self.epoch = np.concatenate(
+                (self.epoch, np.fromiter((c["epoch"] for c in fresh), dtype=np.int64, count=len(fresh)))
+            )[-self.size:]
+            for field in PRICE_FIELDS:
+                self.prices[field] = np.concatenate(
+                    (self.prices[field], np.fromiter((c[field] for c in fresh), dtype=np.float64, count=len(fresh)))
+                )[-self.size:]
+
+        if revised or fresh:
+            self._frame = None
+        return revised, len(fresh)
+
+    def load(self, columns: dict) -> None:
+        """Replaces the buffer contents with stored candles given as column arrays."""
+        self.epoch = np.array(columns["epoch"][-self.size:], dtype=np.int64)
+        self.prices = {field: np.array(columns[field][-self.size:], dtype=np.float64) for field in PRICE_FIELDS}
+        self._frame = None
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the buffer as the epoch-indexed OHLC DataFrame the scanner works with."""
+        if self._frame is None:
+            index = pd.DatetimeIndex(pd.to_datetime(self.epoch, unit="s"), name="epoch")
+            self._frame = pd.DataFrame({field: self.prices[field] for field in PRICE_FIELDS}, index=index)
+        return self._frame
+
+
+class CandleCache:
+    """
+    Holds one CandleBuffer per (symbol, granularity).
+    With a CandleStore attached, new buffers warm-start from disk and closed bars are written back.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._buffers = {}
+
+    def buffer(self, symbol: str, granularity: int, size: int) -> CandleBuffer:
+        """Returns the buffer for this pair, creating (or resizing) it as needed."""
+        buf = self._buffers.get((symbol, granularity))
+        if buf is None or buf.size != size:
+            buf = CandleBuffer(symbol, granularity, size)
+            if self.store is not None:
+                buf.load(self.store.tail(symbol, granularity, size))
+            self._buffers[(symbol, granularity)] = buf
+        return buf
+
+    def record(self, buf: CandleBuffer) -> None:
+        """Persists the buffer's closed bars, i.e. all but the still-forming last one."""
+        if self.store is None or len(buf) < 2:
+            return
+        columns = {"epoch": buf.epoch[:-1]}
+        columns.update({field: buf.prices[field][:-1] for field in PRICE_FIELDS})
+        try:
+            self.store.append(buf.symbol, buf.granularity, columns)
+        except OSError as e:
+            logger.error(f"Failed to store candles for {buf.symbol}: {e}")
+
+    def clear(self) -> None:
+        self._buffers.clear()
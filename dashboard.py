@@ -1,8 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
-from flask_login import login_required, current_user
-import firestore_config
-from firebase_admin import firestore
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, session, g
+from flask_login import login_required
+import hashlib
 from datetime import datetime
+from latest_signals import latest_signals
 import logging
 
 # Configure logging
@@ -18,10 +18,17 @@ from paid_required import paid_required
 @dashboard.route('/dashboard')
 @paid_required
 def view():
-    # Retrieve the latest 20 signals from Firestore
-    signals = [d.to_dict() for d in firestore_config.db.collection('signals')
-                              .order_by('time', direction=firestore.Query.DESCENDING)
-                              .limit(20)
-                              .stream()]
-    logger.debug("Fetched %d signals for user %s", len(signals), current_user.id)
-    return render_template('dashboard.html', signals=signals)
\ No newline at end of file
+    # The latest 20 signals, kept in memory from the materialized meta/latest_signals document
+    signals, signals_etag = latest_signals.get()
+    etag = hashlib.sha1(f"{signals_etag}:{g.uid}".encode()).hexdigest()
+    # A pending flash message must be rendered, and that page must not be revalidated later
+    has_flashes = bool(session.get('_flashes'))
+    if not has_flashes and etag in request.if_none_match:
+        return "", 304, {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+
+    logger.debug("Serving %d signals to user %s", len(signals), g.uid)
+    response = make_response(render_template('dashboard.html', signals=signals))
+    if not has_flashes:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
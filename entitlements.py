@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from cachetools import TTLCache
+from flask import session
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+# A claim is trusted for this long before paid_required re-checks Firestore
+ENTITLEMENT_TTL = int(os.getenv("ENTITLEMENT_TTL", "900"))
+# Claims whose paid access ends within this many seconds are re-checked too
+ENTITLEMENT_REFRESH_BEFORE = 300
+SESSION_KEY = "entitlement"
+
+_serializer = URLSafeTimedSerializer(os.getenv("SECRET_KEY"), salt="entitlement")
+
+# uid -> epoch second before which claims are rejected; entries outlive every claim they cover
+_revoked = TTLCache(maxsize=100_000, ttl=ENTITLEMENT_TTL)
+_revoked_lock = threading.Lock()
+
+
+def _expiry(user) -> Optional[float]:
+    """Epoch seconds at which the user's paid access ends (code_expires, else paid_until)."""
+    value = user.code_expires or user.paid_until
+    if not value:
+        return None
+    expires = datetime.fromisoformat(value)
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires.timestamp()
+
+
+def issue(user) -> Optional[dict]:
+    """Stores a signed (uid, paid-until) claim in the session and returns it, or removes it if the user has not paid."""
+    expires = _expiry(user) if user.is_paid else None
+    if expires is None:
+        session.pop(SESSION_KEY, None)
+        return None
+    data = {"uid": user.id, "until": int(expires)}
+    session[SESSION_KEY] = _serializer.dumps(data)
+    return data
+
+
+def revoke(uid: str) -> None:
+    """Rejects every claim issued to `uid` before now, in this process, so the next check reads Firestore."""
+    with _revoked_lock:
+        _revoked[uid] = int(time.time())
+
+
+def clear() -> None:
+    session.pop(SESSION_KEY, None)
+
+
+def claim(uid: Optional[str]) -> Optional[dict]:
+    """
+    The session's claim for `uid` ({"uid", "until"}) if it is correctly signed, at most ENTITLEMENT_TTL old,
+    not revoked, and with paid access lasting beyond ENTITLEMENT_REFRESH_BEFORE.
+    None means the caller has to decide from the stored user.
+    """
+    token = session.get(SESSION_KEY)
+    if not token or not uid:
+        return None
+    try:
+        data, issued = _serializer.loads(token, max_age=ENTITLEMENT_TTL, return_timestamp=True)
+    except BadSignature:  # also covers expired claims
+        return None
+    if data.get("uid") != uid:
+        return None
+    with _revoked_lock:
+        revoked_at = _revoked.get(uid)
+    if revoked_at is not None and issued.timestamp() < revoked_at:
+        return None
+    return data if data.get("until", 0) - time.time() > ENTITLEMENT_REFRESH_BEFORE else None
@@ -0,0 +1,316 @@
+#
+#  --- Offline Deriv API Stand-in ---
+#
+#  A local websocket server speaking the part of the Deriv API the scanner uses:
+#  `authorize`, `ticks_history` with `style: candles` (including `subscribe: 1` OHLC
+#  streams), `forget`, `forget_all` and `ping`. Candles are synthetic (deterministic
+#  per symbol and time) or replayed from a CandleStore, and every response can be
+#  delayed, jittered, failed or rate limited.
+#
+#  Usage:
+#      python fake_deriv.py --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.01 --rate-limit 30
+#      DERIV_ENDPOINT=ws://localhost:8765 SCAN_SYMBOLS=$(python fake_deriv.py --list-symbols 370) python scanner.py
+#
+#  FakeDerivAPI offers the same behaviour in-process, without a socket, for benchmarks.
+#
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+import zlib
+
+import websockets
+from deriv_api.errors import ResponseError
+
+from candle_store import CandleStore
+
+logger = logging.getLogger(__name__)
+
+MAX_CANDLES = 5000  # Deriv's cap on candles per ticks_history response
+
+
+def synthetic_symbols(count: int) -> list:
+    """Symbol names for load tests; any name is accepted by the synthetic source."""
+    return [f"SYN{i:05d}" for i in range(count)]
+
+
+class SyntheticCandles:
+    """
+    Deterministic prices: every (symbol, second) maps to the same price on every request,
+    so overlapping and incremental requests agree with each other.
+    """
+
+    def price(self, symbol: str, second: int) -> float:
+        seed = zlib.crc32(symbol.encode())
+        base = 1.0 + (seed % 2000) / 100.0
+        phase = (seed % 997) / 997.0 * 2 * math.pi
+        wave = 0.01 * math.sin(second / 86400.0 * 2 * math.pi + phase) + 0.004 * math.sin(second / 5400.0 + phase)
+        noise = (zlib.crc32(f"{symbol}:{second // 60}".encode()) / 0xFFFFFFFF - 0.5) * 0.001
+        return round(base * (1.0 + wave + noise), 5)
+
+    def candles(self, symbol: str, granularity: int, start: int, end: int, now: int) -> list:
+        """Bars opening in [start, end]; the bar containing `now` is still forming."""
+        first = start - start % granularity
+        if first < start:
+            first += granularity
+        out = []
+        for open_time in range(first, min(end, now) + 1, granularity):
+            close_time = min(open_time + granularity - 1, now)
+            points = [self.price(symbol, s) for s in range(open_time, close_time + 1, max(1, granularity // 12))]
+            points.append(self.price(symbol, close_time))
+            out.append({
+                "epoch": open_time,
+                "open": points[0],
+                "high": max(points),
+                "low": min(points),
+                "close": points[-1],
+            })
+        return out
+
+
+class RecordedCandles:
+    """
+    Replays candles from a CandleStore. Recorded history is shifted in time so that its midpoint
+    lines up with server start: half of it is history, the other half plays out live.
+    Granularities that were not recorded fall back to synthetic candles.
+    """
+
+    def __init__(self, store: CandleStore, granularity: int = 300):
+        self.store = store
+        self.granularity = granularity
+        self.synthetic = SyntheticCandles()
+        self.offsets = {}
+        started = int(time.time())
+        for symbol in store.symbols(granularity):
+            epochs = store.read(symbol, granularity)["epoch"]
+            if len(epochs):
+                midpoint = int(epochs[0] + (epochs[-1] - epochs[0]) // 2)
+                shift = started - midpoint
+                self.offsets[symbol] = shift - shift % granularity
+
+    def candles(self, symbol: str, granularity: int, start: int, end: int, now: int) -> list:
+        if granularity != self.granularity or symbol not in self.offsets:
+            return self.synthetic.candles(symbol, granularity, start, end, now)
+        offset = self.offsets[symbol]
+        stored = self.store.read(symbol, granularity, start - offset, min(end, now) - offset)
+        columns = {column: values.tolist() for column, values in stored.items()}
+        return [
+            {"epoch": epoch + offset, "open": o, "high": h, "low": l, "close": c}
+            for epoch, o, h, l, c in zip(columns["epoch"], columns["open"], columns["high"],
+                                         columns["low"], columns["close"])
+        ]
+
+
+class FakeDeriv:
+    """Request handling shared by the websocket server and FakeDerivAPI."""
+
+    def __init__(self, source=None, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, tick_interval: float = 1.0, seed: int | None = None):
+        self.source = source or SyntheticCandles()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # requests per second per connection, 0 = unlimited
+        self.tick_interval = tick_interval
+        self.random = random.Random(seed)
+        self.requests = 0
+
+    async def delay(self) -> None:
+        wait = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def respond(self, request: dict, msg_type: str, payload: dict | None = None, error: tuple | None = None) -> dict:
+        echo = {k: v for k, v in request.items() if k != "req_id"}
+        response = {"echo_req": echo, "msg_type": msg_type}
+        if "req_id" in request:
+            response["req_id"] = request["req_id"]
+        if error:
+            response["error"] = {"code": error[0], "message": error[1]}
+        else:
+            response.update(payload or {})
+        return response
+
+    def handle(self, request: dict, limiter: "TokenBucket | None" = None) -> dict:
+        """Builds the response to one request (without the artificial delay)."""
+        self.requests += 1
+        msg_type = next((k for k in ("authorize", "ticks_history", "forget_all", "forget", "ping") if k in request),
+                        None)
+        if msg_type is None:
+            return self.respond(request, "error", error=("UnrecognisedRequest", "Unrecognised request."))
+        if limiter and not limiter.take():
+            return self.respond(request, msg_type, error=("RateLimit", f"You have reached the rate limit for {msg_type}."))
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.respond(request, msg_type, error=("InternalServerError", "Sorry, an error occurred."))
+
+        if msg_type == "authorize":
+            return self.respond(request, "authorize", {"authorize": {
+                "loginid": "VRTC0000000", "currency": "USD", "balance": 10000, "is_virtual": 1,
+            }})
+        if msg_type == "ping":
+            return self.respond(request, "ping", {"ping": "pong"})
+        if msg_type == "forget":
+            return self.respond(request, "forget", {"forget": 1})
+        if msg_type == "forget_all":
+            return self.respond(request, "forget_all", {"forget_all": []})
+        return self.ticks_history(request)
+
+    def ticks_history(self, request: dict) -> dict:
+        if request.get("style") != "candles":
+            return self.respond(request, "history", error=("InputValidationFailed", "Only candles are supported."))
+        granularity = int(request.get("granularity", 60))
+        count = min(int(request.get("count", MAX_CANDLES)), MAX_CANDLES)
+        now = int(time.time())
+        end = now if request.get("end", "latest") == "latest" else min(int(request["end"]), now)
+        start = int(request["start"]) if "start" in request else end - (count - 1) * granularity - end % granularity
+        candles = self.source.candles(request["ticks_history"], granularity, start, end, now)[-count:]
+        payload = {"candles": candles, "pip_size": 5}
+        if request.get("subscribe"):
+            payload["subscription"] = {"id": uuid.uuid4().hex}
+        return self.respond(request, "candles", payload)
+
+    def ohlc(self, request: dict, subscription_id: str) -> dict:
+        """The current state of a subscribed symbol's forming bar."""
+        granularity = int(request.get("granularity", 60))
+        now = int(time.time())
+        bars = self.source.candles(request["ticks_history"], granularity, now - now % granularity, now, now)
+        if not bars:
+            return None
+        bar = bars[-1]
+        return self.respond(request, "ohlc", {
+            "ohlc": {
+                "symbol": request["ticks_history"],
+                "granularity": granularity,
+                "epoch": now,
+                "open_time": bar["epoch"],
+                "open": f"{bar['open']:.5f}",
+                "high": f"{bar['high']:.5f}",
+                "low": f"{bar['low']:.5f}",
+                "close": f"{bar['close']:.5f}",
+                "id": subscription_id,
+                "pip_size": 5,
+            },
+            "subscription": {"id": subscription_id},
+        })
+
+
+class TokenBucket:
+    """Allows `rate` requests per second with bursts of up to one second's worth."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class FakeDerivAPI:
+    """In-process stand-in for deriv_api.DerivAPI's request/response calls."""
+
+    def __init__(self, fake: FakeDeriv | None = None):
+        self.fake = fake or FakeDeriv()
+        self.limiter = TokenBucket(self.fake.rate_limit) if self.fake.rate_limit else None
+
+    async def send(self, request: dict) -> dict:
+        response = self.fake.handle(request, self.limiter)
+        await self.fake.delay()
+        if "error" in response:
+            raise ResponseError(response)
+        return response
+
+    async def authorize(self, request: dict) -> dict:
+        return await self.send(request)
+
+    async def disconnect(self) -> None:
+        pass
+
+
+async def serve_connection(fake: FakeDeriv, websocket, path=None) -> None:
+    """Handles one client: every request is answered independently, so responses may interleave."""
+    limiter = TokenBucket(fake.rate_limit) if fake.rate_limit else None
+    streams = {}
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict) -> None:
+        async with send_lock:
+            await websocket.send(json.dumps(message))
+
+    async def stream(request: dict, subscription_id: str) -> None:
+        while True:
+            await asyncio.sleep(fake.tick_interval)
+            message = fake.ohlc(request, subscription_id)
+            if message:
+                await send(message)
+
+    async def answer(request: dict) -> None:
+        response = fake.handle(request, limiter)
+        await fake.delay()
+        await send(response)
+        subscription = response.get("subscription")
+        if subscription:
+            streams[subscription["id"]] = asyncio.create_task(stream(request, subscription["id"]))
+        elif "forget" in request and request["forget"] in streams:
+            streams.pop(request["forget"]).cancel()
+        elif "forget_all" in request:
+            for task in streams.values():
+                task.cancel()
+            streams.clear()
+
+    tasks = set()
+    try:
+        async for raw in websocket:
+            try:
+                request = json.loads(raw)
+            except ValueError:
+                continue
+            task = asyncio.create_task(answer(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        for task in [*tasks, *streams.values()]:
+            task.cancel()
+
+
+async def serve(fake: FakeDeriv, host: str, port: int) -> None:
+    async with websockets.serve(lambda ws, path=None: serve_connection(fake, ws, path), host, port):
+        logger.info(f"Fake Deriv API listening on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Deriv websocket API.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second per connection (0 = off)")
+    parser.add_argument("--tick-interval", type=float, default=1.0, help="Seconds between OHLC stream updates")
+    parser.add_argument("--store", help="Replay candles from this CandleStore instead of synthesizing them")
+    parser.add_argument("--list-symbols", type=int, metavar="N",
+                        help="Print N comma-separated synthetic symbol names and exit")
+    args = parser.parse_args()
+
+    if args.list_symbols:
+        print(",".join(synthetic_symbols(args.list_symbols)))
+    else:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        source = RecordedCandles(CandleStore(args.store)) if args.store else SyntheticCandles()
+        fake = FakeDeriv(source, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                         error_rate=args.error_rate, rate_limit=args.rate_limit, tick_interval=args.tick_interval)
+        asyncio.run(serve(fake, args.host, args.port))
@@ -1,67 +1,213 @@
+#
+#  --- Economic Calendar Ingestion ---
+#
+#  The Investing.com calendar page is fetched over a persistent pooled session with
+#  conditional requests (ETag / Last-Modified), so an unchanged page costs a 304. Each
+#  new page is parsed once, only inside the calendar table (SoupStrainer), into
+#  normalized events indexed by date; per-date queries are dictionary lookups.
+#
+#  FF_CALENDAR_FIXTURE reads a saved page instead of the network (offline runs, tests).
+#
+#  Usage:
+#      python ff_feeds.py save calendar.html              (download a fixture)
+#      python ff_feeds.py bench calendar.html --repeat 20 (parse time, full tree vs strained)
+#
+
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timezone
-from flask import current_app
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+
+CALENDAR_URL = "https://www.investing.com/economic-calendar/"
+CALENDAR_FIXTURE = os.getenv("FF_CALENDAR_FIXTURE")
+MIN_REFRESH_INTERVAL = 60  # Seconds during which the stored page is used without asking again
+FETCH_TIMEOUT = 10
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
     "Referer": "https://www.investing.com/economic-calendar/",
 }
 
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+logger = logging.getLogger(__name__)
+
+_session = requests.Session()
+_session.headers.update(HEADERS)
+_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
+_CALENDAR_TABLE = SoupStrainer("table", id="economicCalendarData")
+_IMPACTS = (("red", "high"), ("orange", "medium"), ("green", "low"))
+
+
+def parse_calendar(html, strained: bool = True) -> list:
+    """Normalized events from a calendar page. `strained=False` builds the whole tree (for benchmarks)."""
+    soup = BeautifulSoup(html, PARSER, parse_only=_CALENDAR_TABLE if strained else None)
+    table = soup.find("table", {"id": "economicCalendarData"})
+    if not table:
+        raise ValueError("Economic calendar table not found")
+
+    events = []
+    for row in table.find_all("tr", {"class": ["js-event-item", "economic-event"]}, recursive=False):
+        cells = row.find_all("td", recursive=False)
+        if len(cells) < 5:
+            continue
+
+        date_elem = cells[0].find("span", class_="date")
+        if date_elem is None:
+            continue
+        event_date = datetime.strptime(date_elem.get_text(strip=True).split()[0], "%Y-%m-%d").date()
+        time_str = cells[1].get_text(strip=True) or "All Day"
+
+        currency_link = cells[2].find("a")
+        event_link = cells[3].find("a")
+        impact_classes = (cells[4].find("span") or {}).get("class", [])
+        impact = next((level for colour, level in _IMPACTS if colour in impact_classes), "low")
+
+        events.append({
+            "date": event_date.isoformat(),
+            "time": time_str,
+            "currency": currency_link.get_text(strip=True) if currency_link else "N/A",
+            "event": (event_link or cells[3]).get_text(strip=True),
+            "impact": impact
+        })
+    return events
+
+
+class CalendarStore:
+    """The last parsed calendar page, indexed by date, refreshed with conditional requests."""
+
+    def __init__(self, url: str = CALENDAR_URL, fixture: str | None = CALENDAR_FIXTURE):
+        self.url = url
+        self.fixture = fixture
+        self._lock = threading.Lock()
+        self._events = []
+        self._by_date = {}
+        self._etag = None
+        self._last_modified = None
+        self._checked = 0.0
+        self.loaded = False
+
+    def _index(self, events: list) -> None:
+        by_date = {}
+        for event in events:
+            by_date.setdefault(event["date"], []).append(event)
+        self._events, self._by_date, self.loaded = events, by_date, True
+
+    def _download(self) -> bytes | None:
+        """The page body, or None if it has not changed since the last download."""
+        if self.fixture:
+            with open(self.fixture, "rb") as f:
+                return f.read()
+
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+        response = _session.get(self.url, headers=headers, timeout=FETCH_TIMEOUT)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        self._etag = response.headers.get("ETag")
+        self._last_modified = response.headers.get("Last-Modified")
+        return response.content
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-reads the page unless it was checked within MIN_REFRESH_INTERVAL. Returns True if it changed."""
+        with self._lock:
+            if not force and self.loaded and time.time() - self._checked < MIN_REFRESH_INTERVAL:
+                return False
+            body = self._download()
+            self._checked = time.time()
+            if body is None:
+                logger.debug("Economic calendar not modified.")
+                return False
+            started = time.perf_counter()
+            self._index(parse_calendar(body))
+            logger.debug(f"Parsed {len(self._events)} calendar events in {time.perf_counter() - started:.3f}s.")
+            return True
+
+    def events(self, date_filter: date | None = None) -> list:
+        with self._lock:
+            if date_filter is None:
+                return list(self._events)
+            return list(self._by_date.get(date_filter.isoformat(), []))
+
+
+calendar_store = CalendarStore()
+
+
 def fetch_economic_calendar(date_filter=None):
+    """
+    Calendar events, all of them or those on `date_filter`. A failed refresh serves the
+    last parsed page; it raises only if nothing has been parsed yet.
+    """
     try:
-        url = "https://www.investing.com/economic-calendar/"
-        session = requests.Session()
-        response = session.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        events = []
-        table = soup.find("table", {"id": "economicCalendarData"})
-        if not table:
-            current_app.logger.warning("Economic calendar table not found")
-            return events
-
-        for row in table.find_all("tr", {"class": ["js-event-item", "economic-event"]}, recursive=False):
-            cells = row.find_all("td", recursive=False)
-            if len(cells) < 5:
-                continue
-            
-            # Extract date and time
-            date_time = cells[0].find("span", class_="date").get_text(strip=True)
-            event_date = datetime.strptime(date_time.split()[0], "%Y-%m-%d").date()
-            if date_filter and event_date != date_filter:
-                continue
-            time_str = cells[1].get_text(strip=True) if cells[1].get_text(strip=True) else "All Day"
-
-            # Extract currency and event
-            currency = cells[2].find("a").get_text(strip=True) if cells[2].find("a") else "N/A"
-            event = cells[3].find("a").get_text(strip=True) if cells[3].find("a") else cells[3].get_text(strip=True)
-
-            # Extract impact
-            impact_elem = cells[4].find("span")
-            impact = "low"
-            if impact_elem and "green" in impact_elem.get("class", []):
-                impact = "low"
-            elif impact_elem and "orange" in impact_elem.get("class", []):
-                impact = "medium"
-            elif impact_elem and "red" in impact_elem.get("class", []):
-                impact = "high"
-
-            events.append({
-                "date": event_date.isoformat(),
-                "time": time_str,
-                "currency": currency,
-                "event": event,
-                "impact": impact
-            })
-        return events
-    except Exception as e:
-        current_app.logger.warning("Calendar fetch failed: %s", e)
-        return []
+        calendar_store.refresh()
+    except (requests.RequestException, ValueError, OSError) as e:
+        if not calendar_store.loaded:
+            raise
+        logger.warning(f"Calendar fetch failed, serving the last page: {e}")
+    return calendar_store.events(date_filter)
 
 # Keep the news fetch as a fallback (optional)
 def fetch_forexfactory_news():
     # This can be removed or kept as a backup
-    current_app.logger.warning("ForexFactory news fetch not implemented")
-    return []
\ No newline at end of file
+    logger.warning("ForexFactory news fetch not implemented")
+    return []
+
+
+def bench(path: str, repeat: int) -> None:
+    with open(path, "rb") as f:
+        html = f.read()
+    for label, strained in (("full tree", False), ("strained", True)):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            events = parse_calendar(html, strained=strained)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"{label:>10} ({PARSER}): {len(events)} events, median {timings[len(timings) // 2] * 1000:.1f} ms, "
+              f"best {timings[0] * 1000:.1f} ms over {repeat} runs of {len(html) / 1024:.0f} KB")
+
+    store = CalendarStore(fixture=path)
+    store.refresh()
+    days = sorted(store._by_date)
+    started = time.perf_counter()
+    for _ in range(1000):
+        for day in days:
+            store.events(date.fromisoformat(day))
+    print(f"date lookups: {(time.perf_counter() - started) * 1e6 / (1000 * max(len(days), 1)):.1f} us each "
+          f"over {len(days)} dates")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Economic calendar fixtures and parse benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    save_parser = subparsers.add_parser("save", help="Download the calendar page to a fixture file")
+    save_parser.add_argument("path")
+    bench_parser = subparsers.add_parser("bench", help="Time parsing a saved calendar page")
+    bench_parser.add_argument("path")
+    bench_parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "save":
+        response = _session.get(CALENDAR_URL, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        with open(args.path, "wb") as f:
+            f.write(response.content)
+        logger.info(f"Saved {len(response.content) / 1024:.0f} KB to {args.path}.")
+    else:
+        bench(args.path, args.repeat)
@@ -1,56 +1,90 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 import firestore_config
+import media
 from firebase_admin import firestore
-import os, uuid, datetime, requests
+import uuid, datetime
 
 forum = Blueprint('forum', __name__)
 
+POSTS_PER_PAGE = 20
+COMMENTS_PER_PAGE = 50
+
+def _page(query, cursor_ref, size):
+    """Runs `query` from just after the `cursor_ref` document. Returns (docs, id of the last doc if more follow)."""
+    if cursor_ref is not None:
+        cursor = cursor_ref.get()
+        if cursor.exists:
+            query = query.start_after(cursor)
+    docs = list(query.limit(size + 1).stream())
+    next_cursor = docs[size - 1].id if len(docs) > size else None
+    return docs[:size], next_cursor
+
 @forum.route('/forum')
 @login_required
 def forum_list():
-    # Fetch all posts ordered by creation time
-    docs = firestore_config.db.collection('posts') \
-             .order_by('created', direction=firestore.Query.DESCENDING) \
-             .stream()
-    posts = [p.to_dict() for p in docs]
-    return render_template('forum_list.html', posts=posts)
+    # One page of posts, newest first; ?after=<post id> continues after that post
+    posts_ref = firestore_config.db.collection('posts')
+    after = request.args.get('after')
+    docs, next_cursor = _page(posts_ref.order_by('created', direction=firestore.Query.DESCENDING),
+                              posts_ref.document(after) if after else None, POSTS_PER_PAGE)
+    topics = []
+    for doc in docs:
+        post = doc.to_dict()
+        topics.append({
+            'id':           doc.id,
+            'title':        (post.get('text') or '')[:80] or '(image)',
+            'author_name':  post.get('author_name') or post.get('author'),
+            'reply_count':  post.get('comment_count', 0),
+            'last_updated': post.get('last_activity') or post.get('created'),
+        })
+    return render_template('forum_list.html', topics=topics, next_cursor=next_cursor)
 
 @forum.route('/forum/post/<post_id>')
 @login_required
 def view_post(post_id):
-    # Fetch single post and its comments
-    doc = firestore_config.db.collection('posts').document(post_id).get()
+    # Fetch the post and one page of its comments, oldest first
+    post_ref = firestore_config.db.collection('posts').document(post_id)
+    doc = post_ref.get()
     if not doc.exists:
         flash('Post not found.', 'warning')
         return redirect(url_for('forum.forum_list'))
     post = doc.to_dict()
-    return render_template('post.html', post=post)
+    comments_ref = post_ref.collection('comments')
+    after = request.args.get('after')
+    comment_docs, next_cursor = _page(comments_ref.order_by('created'),
+                                      comments_ref.document(after) if after else None, COMMENTS_PER_PAGE)
+    comments = [c.to_dict() for c in comment_docs]
+    return render_template('post.html', post=post, comments=comments, next_cursor=next_cursor)
 
 @forum.route('/forum/post', methods=['POST'])
 @login_required
 def new_post():
     text = request.form.get('text', '').strip()
     img = request.files.get('image')
-    img_url = None
+    upload = None
     if img and img.filename:
-        # Upload to imgbb
-        resp = requests.post(
-            'https://api.imgbb.com/1/upload',
-            data={'key': os.getenv('IMGBB_KEY')},
-            files={'image': img.read()}
-        )
-        data = resp.json().get('data', {})
-        img_url = data.get('url')
+        # Spool and check the file now; the imgbb upload runs in the background
+        try:
+            upload = media.prepare(img)
+        except media.UploadRejected as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('forum.forum_list'))
     post_id = str(uuid.uuid4())
+    created = datetime.datetime.utcnow()
     firestore_config.db.collection('posts').document(post_id).set({
-        'id':         post_id,
-        'author':     current_user.id,
-        'text':       text,
-        'image':      img_url,
-        'created':    datetime.datetime.utcnow(),
-        'comments':   []
+        'id':            post_id,
+        'author':        current_user.id,
+        'author_name':   current_user.username,
+        'text':          text,
+        'image':         None,
+        'image_status':  'pending' if upload else None,
+        'created':       created,
+        'last_activity': created,
+        'comment_count': 0
     })
+    if upload:
+        media.enqueue(post_id, *upload)
     return redirect(url_for('forum.forum_list'))
 
 @forum.route('/forum/comment/<post_id>', methods=['POST'])
@@ -60,10 +94,17 @@ def new_comment(post_id):
     comment = {
         'id':      str(uuid.uuid4()),
         'by':      current_user.id,
+        'by_name': current_user.username,
         'text':    text,
         'created': datetime.datetime.utcnow()
     }
-    firestore_config.db.collection('posts').document(post_id).update({
-        'comments': firestore.ArrayUnion([comment])
+    # The comment and the post's denormalized count are written together
+    post_ref = firestore_config.db.collection('posts').document(post_id)
+    batch = firestore_config.db.batch()
+    batch.set(post_ref.collection('comments').document(comment['id']), comment)
+    batch.update(post_ref, {
+        'comment_count': firestore.Increment(1),
+        'last_activity': comment['created']
     })
+    batch.commit()
     return redirect(url_for('forum.view_post', post_id=post_id))
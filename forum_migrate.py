@@ -0,0 +1,64 @@
+#
+#  --- Forum Comment Migration ---
+#
+#  Moves comments embedded in posts/<id>.comments into the posts/<id>/comments
+#  subcollection and sets the post's comment_count and last_activity. Comments keep
+#  their ids as document ids, so the migration can be re-run after an interruption.
+#
+#  Usage:
+#      python forum_migrate.py [--dry-run]
+#
+
+import argparse
+import logging
+
+from firebase_admin import firestore
+
+import firestore_config
+
+MAX_BATCH_WRITES = 500
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_post(doc, dry_run: bool = False) -> int:
+    """Migrates one post. Returns the number of comments moved."""
+    post = doc.to_dict()
+    comments = post.get("comments") or []
+    if dry_run:
+        return len(comments)
+
+    comments_ref = doc.reference.collection("comments")
+    for lo in range(0, len(comments), MAX_BATCH_WRITES):
+        batch = firestore_config.db.batch()
+        for comment in comments[lo:lo + MAX_BATCH_WRITES]:
+            batch.set(comments_ref.document(comment["id"]), comment)
+        batch.commit()
+
+    # Count what the subcollection holds, so comments posted since the last run are included
+    count = sum(1 for _ in comments_ref.select([]).stream())
+    last = max((c["created"] for c in comments if c.get("created")), default=post.get("created"))
+    doc.reference.update({
+        "comments": firestore.DELETE_FIELD,
+        "comment_count": count,
+        "last_activity": max(last, post.get("last_activity") or last),
+    })
+    return len(comments)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move embedded forum comments into subcollections.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    firestore_config.initialize_firestore()
+
+    posts = moved = 0
+    for doc in firestore_config.db.collection("posts").stream():
+        data = doc.to_dict()
+        if "comments" not in data and "comment_count" in data:
+            continue  # already migrated
+        moved += migrate_post(doc, args.dry_run)
+        posts += 1
+    logger.info(f"{'Would move' if args.dry_run else 'Moved'} {moved} comments from {posts} posts.")
@@ -36,7 +36,11 @@ else:
             subject='Your ForexSignal Access Code',
             body=f'Your 30-day access code is: {user.code_issued}'
         )
-        print(f"Email sent successfully to {user.email}")
+        from mail_outbox import outbox
+        if outbox.flush(timeout=60):
+            print(f"Email sent successfully to {user.email}")
+        else:
+            print(f"Email to {user.email} is still queued in {outbox.root}; it is retried on the next start.")
     except Exception as e:
         print(f"Failed to send email: {e}")
     
\ No newline at end of file
@@ -0,0 +1,27 @@
+#
+#  --- Gunicorn Settings ---
+#
+#  Read by gunicorn from the working directory. Web workers are evented (gevent): each
+#  request, and each live-signal stream for its whole life, is a greenlet rather than a
+#  thread, so a worker holds thousands of idle streams. signal_stream caps streams per
+#  process at SSE_MAX_CLIENTS, which always leaves SSE_RESERVED_CONNECTIONS of
+#  WEB_CONNECTIONS free for pages. The scanner (asyncio) runs as its own process.
+#
+#  Usage:
+#      gunicorn app:app
+#      WEB_CONNECTIONS=5000 gunicorn -w 4 app:app
+#
+
+import os
+
+worker_class = "gevent"
+worker_connections = int(os.getenv("WEB_CONNECTIONS", "2000"))
+
+
+def post_fork(server, worker):
+    # Firestore's gRPC channels have to run on gevent's loop; switch them over, with the standard
+    # library already patched, before the app opens one
+    from gevent import monkey
+    monkey.patch_all()
+    from grpc.experimental import gevent as grpc_gevent
+    grpc_gevent.init_gevent()
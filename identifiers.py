@@ -0,0 +1,184 @@
+#
+#  --- Login Identifier Index ---
+#
+#  One small document per login identifier, identifiers/<kind>:<normalized value>,
+#  holding the owning uid, so logins and password resets resolve an email or
+#  username with point reads instead of queries over the users collection.
+#  Identifiers are claimed with create(), never overwritten, so nobody can take over
+#  another user's email or username. Users that were never indexed (e.g. skipped by
+#  backfill because another user's email differs only in case) are still found by an
+#  exact-match query on the users collection.
+#
+#  Usage (index users created before the index existed):
+#      python identifiers.py backfill
+#
+
+import argparse
+import logging
+from typing import Optional
+from urllib.parse import quote
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists  # raised by commits that claim a taken identifier
+
+import firestore_config
+
+COLLECTION = "identifiers"
+KINDS = ("email", "username")
+
+logger = logging.getLogger(__name__)
+
+
+class IdentifierTaken(ValueError):
+    """The email or username already belongs to another user."""
+
+    def __init__(self, kind: str):
+        super().__init__(f"That {kind} is already in use.")
+        self.kind = kind
+
+
+def normalize(value: str) -> str:
+    return value.strip().casefold()
+
+
+def _ref(kind: str, value: str):
+    # Document ids may not contain "/"; quoting keeps them readable otherwise
+    return firestore_config.db.collection(COLLECTION).document(f"{kind}:{quote(normalize(value), safe='@.+-_')}")
+
+
+def _pairs(email: Optional[str], username: Optional[str]) -> list:
+    return [(kind, value) for kind, value in (("email", email), ("username", username)) if value and value.strip()]
+
+
+def _indexed(identifier: str, kinds: tuple) -> Optional[str]:
+    refs = [_ref(kind, identifier) for kind in kinds]
+    found = {snapshot.reference.path: snapshot for snapshot in firestore_config.db.get_all(refs)}
+    for ref in refs:
+        snapshot = found.get(ref.path)
+        if snapshot is not None and snapshot.exists:
+            return snapshot.to_dict().get("uid")
+    return None
+
+
+def unindexed(identifier: str, kinds: tuple = KINDS) -> list:
+    """The uids of users whose stored `kinds` value is exactly `identifier`, found by query instead of the index."""
+    if not identifier or not identifier.strip():
+        return []
+    users = firestore_config.db.collection("users")
+    uids = []
+    for kind in kinds:
+        query = users.where(filter=firestore.FieldFilter(kind, "==", identifier.strip())).limit(5)
+        uids += [doc.id for doc in query.stream() if doc.id not in uids]
+    return uids
+
+
+def lookup(identifier: str, kinds: tuple = KINDS) -> Optional[str]:
+    """
+    Returns the uid owning `identifier` as any of `kinds` (in that order of preference), or None.
+    Identifiers missing from the index fall back to a query on the users collection.
+    """
+    if not identifier or not identifier.strip():
+        return None
+    uid = _indexed(identifier, kinds)
+    if uid is None:
+        uid = next(iter(unindexed(identifier, kinds)), None)
+    return uid
+
+
+def taken(email: Optional[str] = None, username: Optional[str] = None, uid: Optional[str] = None) -> Optional[str]:
+    """The first of "email"/"username" already owned by a user other than `uid`, or None."""
+    for kind, value in _pairs(email, username):
+        owner = lookup(value, (kind,))
+        if owner is not None and owner != uid:
+            return kind
+    return None
+
+
+def index(uid: str, email: Optional[str] = None, username: Optional[str] = None, batch=None) -> None:
+    """
+    Claims the given identifiers for `uid`. Writes go into `batch` when one is passed; the commit
+    then fails as a whole with AlreadyExists if any of them is taken. Without a batch,
+    raises IdentifierTaken.
+    """
+    writer = batch or firestore_config.db.batch()
+    for kind, value in _pairs(email, username):
+        writer.create(_ref(kind, value), {"uid": uid})
+    if batch is None:
+        try:
+            writer.commit()
+        except AlreadyExists as e:
+            raise IdentifierTaken(taken(email, username, uid) or "email or username") from e
+
+
+def release(uid: str, email: Optional[str] = None, username: Optional[str] = None, batch=None) -> None:
+    """Deletes the given identifiers if they belong to `uid`, in `batch` when one is passed."""
+    writer = batch or firestore_config.db.batch()
+    for kind, value in _pairs(email, username):
+        if _indexed(value, (kind,)) == uid:
+            writer.delete(_ref(kind, value))
+    if batch is None:
+        writer.commit()
+
+
+def _owner_in(transaction, kind: str, value: str) -> Optional[str]:
+    snapshot = _ref(kind, value).get(transaction=transaction)
+    return snapshot.to_dict().get("uid") if snapshot.exists else None
+
+
+@firestore.transactional
+def _reindex(transaction, uid: str, old: dict, new: dict, fields: dict) -> None:
+    deletes, sets = [], []
+    for kind in KINDS:
+        before, after = old.get(kind) or "", new.get(kind) or ""
+        if normalize(before) == normalize(after):
+            continue
+        if after.strip():
+            if _owner_in(transaction, kind, after) not in (None, uid):
+                raise IdentifierTaken(kind)
+            sets.append((kind, after))
+        if before.strip() and _owner_in(transaction, kind, before) == uid:
+            deletes.append((kind, before))
+
+    # Firestore transactions do all reads before any write
+    for kind, value in deletes:
+        transaction.delete(_ref(kind, value))
+    for kind, value in sets:
+        transaction.set(_ref(kind, value), {"uid": uid})
+    transaction.update(firestore_config.db.collection("users").document(uid), fields)
+
+
+def reindex(uid: str, old: dict, new: dict, fields: dict) -> None:
+    """
+    Writes `fields` to the user and moves their identifiers from the `old` to the `new`
+    email/username values, in one transaction. Raises IdentifierTaken if a new value belongs
+    to someone else; nothing is written then.
+    """
+    _reindex(firestore_config.db.transaction(), uid, old, new, fields)
+
+
+def backfill() -> int:
+    """Indexes every existing user, never overwriting an identifier owned by someone else. Returns the number of users indexed."""
+    users = 0
+    for doc in firestore_config.db.collection("users").stream():
+        data = doc.to_dict()
+        batch = firestore_config.db.batch()
+        for kind, value in _pairs(data.get("email"), data.get("username")):
+            owner = _indexed(value, (kind,))
+            if owner is None:
+                batch.create(_ref(kind, value), {"uid": doc.id})
+            elif owner != doc.id:
+                logger.warning(f"{kind} {value!r} of user {doc.id} is already indexed for user {owner}; "
+                               f"skipped, lookups find it by query.")
+        batch.commit()
+        users += 1
+    return users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the login identifier index.")
+    parser.add_argument("command", choices=["backfill"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    firestore_config.initialize_firestore()
+    logger.info(f"Indexed the identifiers of {backfill()} users.")
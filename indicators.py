@@ -0,0 +1,277 @@
+import math
+from collections import deque
+
+import numpy as np
+
+NAN = float("nan")
+
+
+class RollingMean:
+    """Simple moving average over the last `length` values (pandas_ta `sma`)."""
+
+    # Re-add the window from scratch this often so the running sum cannot drift
+    RESUM_EVERY = 1000
+
+    def __init__(self, length: int):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.total = 0.0
+        self._appends = 0
+
+    def append(self, x: float) -> None:
+        if len(self.window) == self.length:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        self._appends += 1
+        if self._appends % self.RESUM_EVERY == 0:
+            self.total = math.fsum(self.window)
+
+    def revise(self, x: float) -> None:
+        self.total += x - self.window[-1]
+        self.window[-1] = x
+
+    @property
+    def value(self) -> float:
+        return self.total / self.length if len(self.window) == self.length else NAN
+
+
+class WilderAverage:
+    """
+    Wilder's moving average as pandas_ta `rma` computes it:
+    `ewm(alpha=1/length, adjust=True, min_periods=length)`.
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.num = 0.0
+        self.den = 0.0
+        self.count = 0
+        self._prev = (0.0, 0.0, 0)
+
+    def append(self, x: float) -> None:
+        self._prev = (self.num, self.den, self.count)
+        self._apply(x)
+
+    def revise(self, x: float) -> None:
+        self.num, self.den, self.count = self._prev
+        self._apply(x)
+
+    def _apply(self, x: float) -> None:
+        self.num = self.num * self.decay + x
+        self.den = self.den * self.decay + 1.0
+        self.count += 1
+
+    @property
+    def value(self) -> float:
+        return self.num / self.den if self.count >= self.length else NAN
+
+
+class ExponentialAverage:
+    """
+    Exponential moving average as pandas_ta `ema` computes it: seeded with the simple
+    average of the first `length` values, then `ewm(span=length, adjust=False)`.
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.ema = NAN
+        self.count = 0
+        self.seed_total = 0.0
+        self._prev = (NAN, 0, 0.0)
+
+    def append(self, x: float) -> None:
+        self._prev = (self.ema, self.count, self.seed_total)
+        self._apply(x)
+
+    def revise(self, x: float) -> None:
+        self.ema, self.count, self.seed_total = self._prev
+        self._apply(x)
+
+    def _apply(self, x: float) -> None:
+        self.count += 1
+        if self.count < self.length:
+            self.seed_total += x
+        elif self.count == self.length:
+            self.ema = (self.seed_total + x) / self.length
+        else:
+            self.ema += self.alpha * (x - self.ema)
+
+    @property
+    def value(self) -> float:
+        return self.ema
+
+
+class IndicatorEngine:
+    """
+    Keeps the scanner's 5-minute indicators up to date one candle at a time.
+
+    `append` adds a new bar and `revise` replaces the close of the last (still-forming) bar;
+    both run in constant time. The values match pandas_ta's `sma`, `rsi` and `macd` computed
+    over the same closes, and `latest()` returns them under the same names as the
+    `compute_indicators` columns so `analyze_signal_for_symbol` can read either.
+    """
+
+    def __init__(self, ma_long: int, ma_short: int, rsi_len: int, sma_len: int,
+                 macd_fast: int, macd_slow: int, macd_signal: int):
+        self.settings = (ma_long, ma_short, rsi_len, sma_len, macd_fast, macd_slow, macd_signal)
+        self.macd_suffix = f"_{macd_fast}_{macd_slow}_{macd_signal}"
+        self.ma_long = RollingMean(ma_long)
+        self.ma_short = RollingMean(ma_short)
+        self.sma = RollingMean(sma_len)
+        self.gains = WilderAverage(rsi_len)
+        self.losses = WilderAverage(rsi_len)
+        self.fast = ExponentialAverage(macd_fast)
+        self.slow = ExponentialAverage(macd_slow)
+        self.signal = ExponentialAverage(macd_signal)
+        # Bars needed before every indicator has a value (the first row `dropna` keeps)
+        self.warmup = max(ma_long, ma_short, sma_len, rsi_len + 1, macd_slow + macd_signal - 1)
+        self.bars = 0
+        self.last_epoch = None
+        self._prev_close = None
+        self._last_close = None
+
+    def __len__(self) -> int:
+        """Number of bars with every indicator defined, i.e. the length of the dropna'd frame."""
+        return max(0, self.bars - self.warmup + 1)
+
+    def append(self, close: float, epoch: int | None = None) -> None:
+        """Adds a newly opened bar."""
+        if self._last_close is not None:
+            change = close - self._last_close
+            self.gains.append(max(change, 0.0))
+            self.losses.append(max(-change, 0.0))
+        self._prev_close, self._last_close = self._last_close, close
+        for average in (self.ma_long, self.ma_short, self.sma, self.fast, self.slow):
+            average.append(close)
+        if self.slow.count >= self.slow.length:
+            self.signal.append(self.fast.value - self.slow.value)
+        self.bars += 1
+        self.last_epoch = epoch
+
+    def revise(self, close: float) -> None:
+        """Replaces the close of the most recent bar."""
+        if self.bars == 0:
+            self.append(close)
+            return
+        if self._prev_close is not None:
+            change = close - self._prev_close
+            self.gains.revise(max(change, 0.0))
+            self.losses.revise(max(-change, 0.0))
+        self._last_close = close
+        for average in (self.ma_long, self.ma_short, self.sma, self.fast, self.slow):
+            average.revise(close)
+        if self.slow.count >= self.slow.length:
+            self.signal.revise(self.fast.value - self.slow.value)
+
+    def sync(self, epochs: np.ndarray, closes: np.ndarray) -> None:
+        """
+        Catches up with a rolling candle window: revises the last bar the engine has seen and
+        appends anything newer. If that bar is no longer in the window, the engine starts over.
+        """
+        if not len(epochs):
+            return
+        start = 0
+        if self.last_epoch is not None:
+            pos = int(np.searchsorted(epochs, self.last_epoch))
+            if pos < len(epochs) and epochs[pos] == self.last_epoch:
+                self.revise(float(closes[pos]))
+                start = pos + 1
+            else:
+                self.__init__(*self.settings)
+        for epoch, close in zip(epochs[start:].tolist(), closes[start:].tolist()):
+            self.append(close, epoch)
+
+    def latest(self) -> dict:
+        """Indicator values for the most recent bar, keyed like the compute_indicators columns."""
+        gain, loss = self.gains.value, self.losses.value
+        rsi = 100.0 * gain / (gain + loss) if gain + loss else NAN
+        macd = self.fast.value - self.slow.value if self.slow.count >= self.slow.length else NAN
+        signal = self.signal.value
+        return {
+            "close": self._last_close if self._last_close is not None else NAN,
+            "ma_long": self.ma_long.value,
+            "ma_short": self.ma_short.value,
+            "rsi": rsi,
+            "sma": self.sma.value,
+            "MACD" + self.macd_suffix: macd,
+            "MACDh" + self.macd_suffix: macd - signal,
+            "MACDs" + self.macd_suffix: signal,
+        }
+
+
+
+def _ema_step(state: dict, x: np.ndarray, length: int) -> None:
+    """Advances a vector of ExponentialAverage states by one bar; NaN inputs leave a row untouched."""
+    active = ~np.isnan(x)
+    count = state["count"] + active
+    seeding = active & (count < length)
+    seeded = active & (count == length)
+    running = active & (count > length)
+    state["seed_total"] = np.where(seeding, state["seed_total"] + np.where(seeding, x, 0.0), state["seed_total"])
+    ema = np.where(seeded, (state["seed_total"] + np.where(seeded, x, 0.0)) / length, state["ema"])
+    state["ema"] = np.where(running, ema + (2.0 / (length + 1)) * (x - ema), ema)
+    state["count"] = count
+
+
+def batch_indicators(closes: np.ndarray, ma_long: int, ma_short: int, rsi_len: int, sma_len: int,
+                     macd_fast: int, macd_slow: int, macd_signal: int) -> dict:
+    """
+    Latest-bar indicators for many symbols in one pass.
+
+    `closes` is a (symbols x bars) array aligned on the most recent bar, with shorter histories
+    padded by NaN on the left. Returns one array per indicator, keyed like IndicatorEngine.latest(),
+    plus "rows": how many rows each symbol's dropna'd compute_indicators frame would have.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n_symbols, n_bars = closes.shape
+    suffix = f"_{macd_fast}_{macd_slow}_{macd_signal}"
+
+    # Simple averages only need the trailing window; a NaN inside it leaves the value undefined
+    def trailing_mean(length: int) -> np.ndarray:
+        if n_bars < length:
+            return np.full(n_symbols, np.nan)
+        return closes[:, -length:].mean(axis=1)
+
+    # Wilder averages with adjust=True are weighted sums, so the last value is a dot product
+    changes = np.diff(closes, axis=1)
+    gains = np.where(np.isnan(changes), np.nan, np.maximum(changes, 0.0))
+    losses = np.where(np.isnan(changes), np.nan, np.maximum(-changes, 0.0))
+    weights = (1.0 - 1.0 / rsi_len) ** np.arange(changes.shape[1] - 1, -1, -1)
+    valid = ~np.isnan(changes)
+    den = (weights * valid).sum(axis=1)
+    enough = valid.sum(axis=1) >= rsi_len
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_gain = np.where(enough, np.nansum(gains * weights, axis=1) / den, np.nan)
+        avg_loss = np.where(enough, np.nansum(losses * weights, axis=1) / den, np.nan)
+        rsi = 100.0 * avg_gain / (avg_gain + avg_loss)
+
+    # The MACD lines are recursive, so walk the bars once with every symbol advanced together
+    fast, slow, signal = (
+        {"ema": np.full(n_symbols, np.nan), "count": np.zeros(n_symbols, dtype=np.int64),
+         "seed_total": np.zeros(n_symbols)}
+        for _ in range(3)
+    )
+    macd = np.full(n_symbols, np.nan)
+    for t in range(n_bars):
+        x = closes[:, t]
+        _ema_step(fast, x, macd_fast)
+        _ema_step(slow, x, macd_slow)
+        macd = np.where(slow["count"] >= macd_slow, fast["ema"] - slow["ema"], np.nan)
+        _ema_step(signal, macd, macd_signal)
+
+    history = (~np.isnan(closes)).sum(axis=1)
+    warmup = max(ma_long, ma_short, sma_len, rsi_len + 1, macd_slow + macd_signal - 1)
+    return {
+        "close": closes[:, -1] if n_bars else np.full(n_symbols, np.nan),
+        "ma_long": trailing_mean(ma_long),
+        "ma_short": trailing_mean(ma_short),
+        "rsi": rsi,
+        "sma": trailing_mean(sma_len),
+        "MACD" + suffix: macd,
+        "MACDh" + suffix: macd - signal["ema"],
+        "MACDs" + suffix: signal["ema"],
+        "rows": np.maximum(0, history - warmup + 1),
+    }
@@ -0,0 +1,126 @@
+#
+#  --- Latest Signals View ---
+#
+#  The newest LATEST_COUNT signals are materialized into one Firestore document,
+#  meta/latest_signals, written in the same transaction as the signals themselves
+#  (see SignalSink). Web processes keep an in-memory copy of that document, updated
+#  by a Firestore listener, so the dashboard and /api/signals read no documents per
+#  request and can answer conditional requests with 304 Not Modified.
+#
+
+import hashlib
+import json
+import logging
+import threading
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists  # another process or a SignalSink commit wrote it first
+
+import firestore_config
+
+LATEST_PATH = ("meta", "latest_signals")
+LATEST_COUNT = 20
+
+logger = logging.getLogger(__name__)
+
+
+def latest_ref():
+    return firestore_config.db.collection(LATEST_PATH[0]).document(LATEST_PATH[1])
+
+
+def merge_latest(current: list, items: list, count: int = LATEST_COUNT) -> list:
+    """Adds newly written signals ({"id", "data"} items) to the materialized list, newest first."""
+    added = [{**item["data"], "id": item["id"]} for item in items]
+    ids = {signal["id"] for signal in added}
+    merged = added + [signal for signal in current if signal.get("id") not in ids]
+    merged.sort(key=lambda signal: signal.get("timestamp", ""), reverse=True)
+    return merged[:count]
+
+
+class LatestSignals:
+    """
+    In-process snapshot of meta/latest_signals. The listener is attached on first use; until its
+    first callback arrives, readers wait up to `wait` seconds.
+    """
+
+    def __init__(self, count: int = LATEST_COUNT, wait: float = 5.0):
+        self.count = count
+        self.wait = wait
+        self._lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        self._signals = []
+        self._etag = self._make_etag([])
+        self._loaded = False
+        self._listeners = []
+
+    @staticmethod
+    def _make_etag(signals: list) -> str:
+        return hashlib.sha1(json.dumps(signals, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _start(self) -> None:
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = latest_ref().on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, snapshots, changes, read_time) -> None:
+        try:
+            for snapshot in snapshots:
+                if snapshot.exists:
+                    self.update((snapshot.to_dict() or {}).get("signals", []))
+                else:
+                    self._seed()
+        except Exception as e:
+            logger.error("Failed to refresh the latest signals: %s", e)
+
+    def _seed(self) -> None:
+        """Builds the document from the signals collection the first time it is needed."""
+        docs = (firestore_config.db.collection("signals")
+                .order_by("timestamp", direction=firestore.Query.DESCENDING)
+                .limit(self.count)
+                .stream())
+        signals = [{**doc.to_dict(), "id": doc.id} for doc in docs]
+        try:
+            # create(), not set(): a seed must never overwrite signals a SignalSink transaction just merged in
+            latest_ref().create({"signals": signals, "updated": firestore.SERVER_TIMESTAMP})
+        except AlreadyExists:
+            logger.info("meta/latest_signals was written meanwhile; the listener will deliver it.")
+            return
+        logger.info("Materialized %d latest signals.", len(signals))
+        self.update(signals)
+
+    def add_listener(self, callback) -> None:
+        """`callback(signals)` receives the signals each later update adds, oldest first."""
+        self._listeners.append(callback)
+
+    def update(self, signals: list) -> None:
+        with self._lock:
+            known = {signal.get("id") for signal in self._signals}
+            added = [signal for signal in reversed(signals[:self.count]) if signal.get("id") not in known]
+            notify = self._loaded and added
+            self._signals = signals[:self.count]
+            self._etag = self._make_etag(self._signals)
+            self._loaded = True
+        self._ready.set()
+        if notify:
+            for callback in self._listeners:
+                callback(added)
+
+    def get(self) -> tuple:
+        """Returns: (signals newest first, ETag of that list)."""
+        if self._watch is None:
+            try:
+                self._start()
+            except Exception as e:
+                logger.error("Failed to watch the latest signals: %s", e)
+                self._ready.set()
+        if not self._ready.wait(self.wait):
+            logger.warning("Latest signals not loaded after %.0fs; serving what is cached.", self.wait)
+            self._ready.set()  # only the first requests wait
+        with self._lock:
+            return self._signals, self._etag
+
+
+# Shared by the dashboard and /api/signals
+latest_signals = LatestSignals()
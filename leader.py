@@ -0,0 +1,198 @@
+#
+#  --- Scanner Leader Election ---
+#
+#  Every process that may run the scanner (each gunicorn worker, the dedicated
+#  scanner worker) competes for one lease; only its holder scans. The holder renews
+#  the lease every LEASE_HEARTBEAT seconds and stops scanning as soon as a renewal
+#  fails. When the holder dies, its lease lapses after LEASE_TTL seconds and a
+#  standby takes over.
+#
+#    file       an exclusive flock on SCANNER_LOCK_FILE (one host, e.g. local runs);
+#               the OS drops it the moment the holder exits
+#    firestore  a lease document, meta/scanner_leader, claimed and renewed in
+#               transactions (all hosts sharing the Firestore project)
+#
+#  SCANNER_LEASE picks the backend: "file", "firestore" or "none" (always lead).
+#  It defaults to "firestore" whenever FIREBASE_CONFIG_JSON is set, i.e. in every
+#  deployment where more than one host could be scanning, and to "file" otherwise.
+#
+
+import asyncio
+import fcntl
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable
+
+import firestore_config
+
+SCANNER_LEASE = os.getenv("SCANNER_LEASE", "firestore" if os.getenv("FIREBASE_CONFIG_JSON") else "file")
+SCANNER_LOCK_FILE = os.getenv("SCANNER_LOCK_FILE", "scanner.lock")
+LEASE_TTL = int(os.getenv("LEASE_TTL", "60"))  # Seconds a lease lasts without a heartbeat
+LEASE_HEARTBEAT = int(os.getenv("LEASE_HEARTBEAT", "15"))  # Seconds between renewals (and takeover attempts)
+LEASE_PATH = ("meta", "scanner_leader")
+
+logger = logging.getLogger(__name__)
+
+
+def _owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class NoLease:
+    """Always leads; for deployments that guarantee a single scanner process themselves."""
+
+    owner = "local"
+
+    def acquire(self) -> bool:
+        return True
+
+    def renew(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+
+class FileLease:
+    """An exclusive, non-blocking flock; held until released or the process exits."""
+
+    def __init__(self, path: str = SCANNER_LOCK_FILE):
+        self.path = path
+        self.owner = _owner_id()
+        self._fd = None
+
+    def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{self.owner}\n".encode())
+        self._fd = fd
+        return True
+
+    def renew(self) -> bool:
+        return self._fd is not None
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class FirestoreLease:
+    """A lease document with an owner and an expiry, claimed and renewed in transactions."""
+
+    def __init__(self, path: tuple = LEASE_PATH, ttl: int = LEASE_TTL, heartbeat: int = LEASE_HEARTBEAT):
+        self.path = path
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.owner = _owner_id()
+        self._expires = 0.0
+
+    def _ref(self):
+        return firestore_config.db.collection(self.path[0]).document(self.path[1])
+
+    def _claim(self, takeover: bool) -> bool:
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def claim(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else {}
+            now = time.time()
+            mine = current.get("owner") == self.owner
+            if not mine and (not takeover or current.get("expires", 0) > now):
+                return None
+            expires = now + self.ttl
+            transaction.set(ref, {
+                "owner": self.owner,
+                "expires": expires,
+                "heartbeat": now,
+                "since": current.get("since", now) if mine else now,
+            })
+            return expires
+
+        expires = claim(firestore_config.db.transaction(), self._ref())
+        if expires is None:
+            return False
+        self._expires = expires
+        return True
+
+    def acquire(self) -> bool:
+        return self._claim(takeover=True)
+
+    def renew(self) -> bool:
+        """False once another process owns the lease, or ours may have lapsed while Firestore was unreachable."""
+        try:
+            return self._claim(takeover=False)
+        except Exception as e:
+            # Keep leading through brief outages, but stop a heartbeat before anyone could take over
+            logger.warning(f"Scanner lease renewal failed: {e}")
+            return time.time() < self._expires - self.heartbeat
+
+    def release(self) -> None:
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def expire(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.to_dict().get("owner") == self.owner:
+                transaction.update(ref, {"expires": 0})
+
+        try:
+            expire(firestore_config.db.transaction(), self._ref())
+        except Exception as e:
+            logger.warning(f"Could not release the scanner lease (it lapses in {self.ttl}s): {e}")
+        self._expires = 0.0
+
+
+def make_lease(kind: str = SCANNER_LEASE):
+    if kind == "firestore":
+        return FirestoreLease()
+    if kind == "file":
+        return FileLease()
+    if kind == "none":
+        return NoLease()
+    raise ValueError(f"Unknown SCANNER_LEASE {kind!r}; expected file, firestore or none")
+
+
+async def run_as_leader(main: Callable[[], Awaitable], lease=None, heartbeat: float = LEASE_HEARTBEAT) -> None:
+    """
+    Runs `main()` whenever this process holds the lease, heartbeating while it runs.
+    `main` is cancelled when the lease is lost, and restarted if it fails while we still lead.
+    """
+    lease = lease or make_lease()
+    while True:
+        try:
+            leading = await asyncio.to_thread(lease.acquire)
+        except Exception as e:
+            logger.error(f"Scanner lease acquisition failed: {e}")
+            leading = False
+        if not leading:
+            await asyncio.sleep(heartbeat)
+            continue
+
+        logger.info(f"Acquired the scanner lease as {lease.owner}; starting the scanner.")
+        task = asyncio.create_task(main())
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=heartbeat)
+                if not task.done() and not await asyncio.to_thread(lease.renew):
+                    logger.warning("Lost the scanner lease; stopping the scanner.")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            await asyncio.to_thread(lease.release)
+
+        if task.done() and not task.cancelled() and task.exception():
+            logger.error(f"Scanner stopped with an error: {task.exception()}")
+        await asyncio.sleep(heartbeat)
@@ -0,0 +1,251 @@
+#
+#  --- Mail Outbox ---
+#
+#  Transactional email leaves request handlers through a file-backed queue:
+#
+#      <root>/tmp/   messages being written
+#      <root>/new/   queued messages, named "<not-before epoch>-<id>.json" so a sorted
+#                    listing is delivery order and retries wait for their time
+#      <root>/cur/   messages claimed by a worker (claimed by an atomic rename, so every
+#                    web process can drain the same outbox)
+#      <root>/dead/  messages that failed permanently or ran out of attempts
+#
+#  Worker threads keep an authenticated SMTP connection open between messages.
+#  Try it against a local debugging server:
+#      python -m aiosmtpd -n -l localhost:1025   (then SMTP_SERVER=localhost SMTP_PORT=1025 SMTP_INSECURE=1)
+#
+
+import json
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from collections import deque
+from email.message import EmailMessage
+
+MAIL_OUTBOX_DIR = os.getenv("MAIL_OUTBOX_DIR", "mail_outbox")
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "2"))
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30  # Seconds before the first retry, doubling after each failure
+RETRY_MAX = 3600
+SMTP_TIMEOUT = 30
+SMTP_IDLE_TIMEOUT = 60  # Idle pooled connections are closed after this many seconds
+CLAIM_TIMEOUT = 600  # Claims older than this belong to a crashed process and are requeued
+# Only for local debugging servers: send without TLS, and never with credentials
+SMTP_INSECURE = os.getenv("SMTP_INSECURE", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+class MailOutbox:
+    """Durable email queue drained by background threads with pooled SMTP connections."""
+
+    def __init__(self, root: str = MAIL_OUTBOX_DIR, workers: int = MAIL_WORKERS, max_attempts: int = MAX_ATTEMPTS):
+        self.root = root
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.dirs = {name: os.path.join(root, name) for name in ("tmp", "new", "cur", "dead")}
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self._sent_times = deque(maxlen=10_000)
+        self._counts = {"sent": 0, "retried": 0, "dead": 0, "connections_opened": 0}
+        self._send_seconds = 0.0
+
+    def _path(self, folder: str, name: str) -> str:
+        return os.path.join(self.dirs[folder], name)
+
+    def _write(self, folder: str, name: str, data: dict) -> None:
+        """Writes a message file atomically: readers never see a partial file."""
+        tmp = self._path("tmp", name)
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(folder, name))
+
+    def enqueue(self, to: str, subject: str, body: str) -> str:
+        """Queues a plain-text email and wakes the workers. Returns the message id."""
+        self.start()
+        message_id = uuid.uuid4().hex
+        self._write("new", f"{time.time():017.6f}-{message_id}.json", {
+            "id": message_id, "to": to, "subject": subject, "body": body,
+            "attempts": 0, "queued": time.time(),
+        })
+        self._wake.set()
+        return message_id
+
+    def start(self) -> None:
+        """Creates the outbox directories, requeues orphaned claims and starts the workers (once)."""
+        with self._start_lock:
+            if self._threads:
+                return
+            for path in self.dirs.values():
+                os.makedirs(path, exist_ok=True)
+            self._requeue_orphans()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"mail-outbox-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _requeue_orphans(self) -> None:
+        for name in os.listdir(self.dirs["cur"]):
+            path = self._path("cur", name)
+            try:
+                if time.time() - os.path.getmtime(path) > CLAIM_TIMEOUT:
+                    os.replace(path, self._path("new", name))
+                    logger.warning(f"Requeued orphaned email {name}.")
+            except FileNotFoundError:
+                pass
+
+    def _due(self) -> list:
+        now = time.time()
+        return [name for name in sorted(os.listdir(self.dirs["new"])) if float(name.split("-", 1)[0]) <= now]
+
+    def _claim(self) -> str | None:
+        """Moves the oldest due message to cur/. Returns its name, or None if nothing is due."""
+        for name in self._due():
+            try:
+                os.rename(self._path("new", name), self._path("cur", name))
+            except FileNotFoundError:
+                continue  # another worker got it first
+            os.utime(self._path("cur", name))  # claim time, for orphan detection
+            return name
+        return None
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(os.getenv('SMTP_SERVER'), int(os.getenv('SMTP_PORT', 587)), timeout=SMTP_TIMEOUT)
+        try:
+            smtp.ehlo()
+            if not SMTP_INSECURE:
+                smtp.starttls()  # raises SMTPNotSupportedError if the server (or someone in between) drops it
+                smtp.ehlo()
+                if os.getenv('EMAIL_USER'):
+                    smtp.login(os.getenv('EMAIL_USER'), os.getenv('EMAIL_PASS'))
+        except Exception:
+            self._close(smtp)
+            raise
+        with self._metrics_lock:
+            self._counts["connections_opened"] += 1
+        return smtp
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP | None) -> None:
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _deliver(self, smtp: smtplib.SMTP | None, message: EmailMessage) -> smtplib.SMTP:
+        """Sends on the pooled connection, reconnecting once if the server dropped it. Returns the connection."""
+        if smtp is not None:
+            try:
+                smtp.send_message(message)
+                return smtp
+            except smtplib.SMTPServerDisconnected:
+                self._close(smtp)
+            except Exception:
+                self._close(smtp)
+                raise
+        smtp = self._connect()
+        try:
+            smtp.send_message(message)
+        except Exception:
+            self._close(smtp)
+            raise
+        return smtp
+
+    @staticmethod
+    def _build(data: dict) -> EmailMessage:
+        msg = EmailMessage()
+        msg.set_content(data["body"])
+        msg['Subject'] = data["subject"]
+        msg['From'] = os.getenv('EMAIL_SENDER')
+        msg['To'] = data["to"]
+        return msg
+
+    def _work(self) -> None:
+        smtp = None
+        last_used = time.monotonic()
+        while True:
+            name = self._claim()
+            if name is None:
+                if smtp is not None and time.monotonic() - last_used > SMTP_IDLE_TIMEOUT:
+                    self._close(smtp)
+                    smtp = None
+                self._wake.wait(timeout=1.0)
+                self._wake.clear()
+                continue
+
+            try:
+                with open(self._path("cur", name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable email {name}: {e}")
+                os.replace(self._path("cur", name), self._path("dead", name))
+                continue
+
+            started = time.monotonic()
+            try:
+                smtp = self._deliver(smtp, self._build(data))
+            except Exception as e:
+                smtp = None  # _deliver closed it
+                self._failed(name, data, e)
+                continue
+
+            last_used = time.monotonic()
+            os.remove(self._path("cur", name))
+            with self._metrics_lock:
+                self._counts["sent"] += 1
+                self._sent_times.append(time.time())
+                self._send_seconds += last_used - started
+            logger.debug(f"Email {data['id']} sent to {data['to']}.")
+
+    def _failed(self, name: str, data: dict, error: Exception) -> None:
+        """Schedules a retry with exponential backoff, or dead-letters the message."""
+        data["attempts"] += 1
+        data["last_error"] = str(error)
+        permanent = isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500 \
+            or isinstance(error, smtplib.SMTPRecipientsRefused)
+        if permanent or data["attempts"] >= self.max_attempts:
+            self._write("dead", name, data)
+            os.remove(self._path("cur", name))
+            with self._metrics_lock:
+                self._counts["dead"] += 1
+            logger.error(f"Email {data['id']} to {data['to']} dead-lettered after {data['attempts']} attempt(s): {error}")
+            return
+
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (data["attempts"] - 1))
+        self._write("new", f"{time.time() + delay:017.6f}-{data['id']}.json", data)
+        os.remove(self._path("cur", name))
+        with self._metrics_lock:
+            self._counts["retried"] += 1
+        logger.warning(f"Email {data['id']} to {data['to']} failed (attempt {data['attempts']}), "
+                       f"retrying in {delay}s: {error}")
+
+    def flush(self, timeout: float = 30) -> bool:
+        """Waits until no message is due or being sent. Returns False if `timeout` ran out first."""
+        self.start()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        while self._due() or os.listdir(self.dirs["cur"]):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def metrics(self) -> dict:
+        """Queue depths and delivery counters, including messages sent in the last minute."""
+        with self._metrics_lock:
+            recent = sum(1 for t in self._sent_times if t > time.time() - 60)
+            counts = dict(self._counts)
+            average = self._send_seconds / counts["sent"] if counts["sent"] else 0.0
+        depths = {f"{folder}_messages": len(os.listdir(path)) if os.path.isdir(path) else 0
+                  for folder, path in self.dirs.items() if folder != "tmp"}
+        return {**counts, **depths, "sent_last_minute": recent, "avg_send_seconds": average}
+
+
+outbox = MailOutbox()
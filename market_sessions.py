@@ -0,0 +1,100 @@
+#
+#  --- Market Sessions and Bar Schedule ---
+#
+#  Which symbols can trade at a given time, and when the next candle closes.
+#
+#    synthetic  R_*, 1HZ*, JD* (and any symbol not listed below): 24/7
+#    forex      frx* currency pairs: Sunday 17:00 to Friday 17:00 New York time
+#    metals     frxXAU*, frxXAG*, ...: Sunday 18:00 to Friday 17:00 New York time, closed 17:00-18:00 daily
+#
+#  FX sessions follow New York's clock, so in UTC they move with US daylight saving time:
+#  22:00 UTC in winter, 21:00 UTC in summer. Exchange holidays are not modelled; on
+#  those days a scan simply finds no new bars.
+#
+#  Ask about a bar by its open time: a bar is tradable if its market was open when it started,
+#  whatever the time is by the moment it has closed and been fetched.
+#
+
+import time
+from datetime import datetime, timezone, tzinfo
+from zoneinfo import ZoneInfo
+
+MINUTES_PER_DAY = 1440
+
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def _as_datetime(when: datetime | float | None) -> datetime:
+    """`when` as an aware datetime; epoch seconds are accepted, None means now."""
+    if when is None:
+        return datetime.now(timezone.utc)
+    if isinstance(when, datetime):
+        return when
+    return datetime.fromtimestamp(when, timezone.utc)
+
+
+class Session:
+    """
+    A weekly trading window in local time `tz`, (weekday, hour) to (weekday, hour) with Monday = 0,
+    plus an optional daily break.
+    """
+
+    def __init__(self, opens: tuple | None = None, closes: tuple | None = None, daily_break: tuple | None = None,
+                 tz: tzinfo = timezone.utc):
+        self.opens = opens[0] * MINUTES_PER_DAY + opens[1] * 60 if opens else None
+        self.closes = closes[0] * MINUTES_PER_DAY + closes[1] * 60 if closes else None
+        self.daily_break = daily_break  # (start hour, end hour), local time
+        self.tz = tz
+
+    def is_open(self, now: datetime) -> bool:
+        now = now.astimezone(self.tz)
+        if self.daily_break and self.daily_break[0] <= now.hour < self.daily_break[1]:
+            return False
+        if self.opens is None:
+            return True
+        minute = now.weekday() * MINUTES_PER_DAY + now.hour * 60 + now.minute
+        if self.opens < self.closes:
+            return self.opens <= minute < self.closes
+        return minute >= self.opens or minute < self.closes  # the window wraps over the weekend
+
+
+SESSIONS = {
+    "synthetic": Session(),
+    "forex": Session(opens=(6, 17), closes=(4, 17), tz=NEW_YORK),
+    "metals": Session(opens=(6, 18), closes=(4, 17), daily_break=(17, 18), tz=NEW_YORK),
+}
+
+
+def market_for(symbol: str) -> str:
+    if symbol.startswith("frxXA"):
+        return "metals"
+    if symbol.startswith("frx"):
+        return "forex"
+    return "synthetic"
+
+
+def is_open(symbol: str, when: datetime | float | None = None) -> bool:
+    """Whether `symbol` trades at `when` (a datetime or epoch seconds, default: now)."""
+    return SESSIONS[market_for(symbol)].is_open(_as_datetime(when))
+
+
+def open_symbols(symbols: list, when: datetime | float | None = None) -> list:
+    """The symbols whose market is open at `when` (default: now), in their original order."""
+    when = _as_datetime(when)
+    return [symbol for symbol in symbols if is_open(symbol, when)]
+
+
+def next_bar_close(granularity: int, settle: float = 0.0, now: float | None = None) -> float:
+    """
+    Epoch seconds of the next `granularity`-second candle close plus `settle` seconds.
+    Computed from the wall clock each time, so a schedule built on it never drifts.
+    """
+    now = time.time() if now is None else now
+    return ((now - settle) // granularity + 1) * granularity + settle
+
+
+def last_closed_bar(granularity: int, now: float | None = None) -> int:
+    """Open epoch of the most recently closed `granularity`-second candle."""
+    now = time.time() if now is None else now
+    return int(now // granularity - 1) * granularity
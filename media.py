@@ -0,0 +1,215 @@
+#
+#  --- Forum Media Pipeline ---
+#
+#  Uploaded images are streamed to a spool file (never held in memory whole), checked
+#  against MAX_UPLOAD_BYTES, downscaled to a thumbnail and uploaded to imgbb on a
+#  background thread pool. The post is published right away with image_status "pending";
+#  the worker saves the image (status "ready") or marks it "failed", then adds the
+#  thumbnail if it can. Pages fall back to the full image when there is none.
+#
+#  Spooled images wait on disk under MEDIA_SPOOL_DIR until they are uploaded:
+#
+#      <root>/tmp/   uploads being written or checked
+#      <root>/new/   queued images, "<post id>.img" plus an optional "<post id>.thumb.jpg"
+#      <root>/cur/   images claimed by a worker (an atomic rename, so processes can share the spool)
+#
+#  resume() runs at startup: it requeues what an earlier process left behind and marks posts
+#  "failed" whose image was lost, e.g. with a wiped disk, instead of leaving them pending.
+#
+#  IMGBB_URL points the uploads elsewhere, e.g. a local stub during tests.
+#
+
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
+
+import firestore_config
+
+IMGBB_URL = os.getenv("IMGBB_URL", "https://api.imgbb.com/1/upload")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(8 * 1024 * 1024)))
+THUMBNAIL_SIZE = (320, 320)
+UPLOAD_TIMEOUT = 20  # Seconds per imgbb request
+UPLOAD_ATTEMPTS = 3
+CHUNK_SIZE = 64 * 1024
+MEDIA_SPOOL_DIR = os.getenv("MEDIA_SPOOL_DIR", "media_spool")
+CLAIM_TIMEOUT = 600  # Claims older than this belong to a crashed process and are requeued
+PENDING_TIMEOUT = 3600  # Seconds before a pending post with nothing spooled is marked failed
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("MEDIA_WORKERS", "2")), thread_name_prefix="media")
+_session = requests.Session()
+_dirs = {name: os.path.join(MEDIA_SPOOL_DIR, name) for name in ("tmp", "new", "cur")}
+
+
+class UploadRejected(ValueError):
+    """The uploaded file is too large or not an image."""
+
+
+def spool(file_storage) -> str:
+    """Copies an uploaded file to a spool file in chunks. Returns its path; the caller owns the file."""
+    os.makedirs(_dirs["tmp"], exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=_dirs["tmp"])
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := file_storage.stream.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadRejected(f"Images can be at most {MAX_UPLOAD_BYTES / (1024 * 1024):.3g} MB.")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def make_thumbnail(path: str) -> str | None:
+    """
+    Writes a downscaled JPEG copy of the image at `path`. Returns its path, or None when Pillow is
+    not installed. Raises UploadRejected if the file is not a readable image.
+    """
+    try:
+        from PIL import Image, UnidentifiedImageError
+    except ImportError:
+        logger.warning("Pillow is not installed; skipping thumbnails.")
+        return None
+
+    try:
+        with Image.open(path) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            fd, thumb_path = tempfile.mkstemp(prefix="thumb-", suffix=".jpg", dir=_dirs["tmp"])
+            with os.fdopen(fd, "wb") as out:
+                img.convert("RGB").save(out, "JPEG", quality=80, optimize=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise UploadRejected("The file is not a supported image.") from e
+    return thumb_path
+
+
+def _upload(path: str) -> str:
+    """Uploads one file to imgbb, retrying with backoff. Returns its URL."""
+    for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+        try:
+            with open(path, "rb") as f:
+                resp = _session.post(IMGBB_URL, data={"key": os.getenv("IMGBB_KEY")}, files={"image": f},
+                                     timeout=UPLOAD_TIMEOUT)
+            resp.raise_for_status()
+            url = resp.json().get("data", {}).get("url")
+            if url:
+                return url
+            raise ValueError(f"no URL in the response: {resp.text[:200]}")
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Image upload failed (attempt {attempt}/{UPLOAD_ATTEMPTS}): {e}")
+            if attempt == UPLOAD_ATTEMPTS:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def _spooled(folder: str, post_id: str, thumbnail: bool = False) -> str:
+    return os.path.join(_dirs[folder], f"{post_id}.thumb.jpg" if thumbnail else f"{post_id}.img")
+
+
+def _move(post_id: str, source: str, target: str) -> None:
+    """Moves a spooled thumbnail and then its image; the image's presence is what queues or claims the job."""
+    if os.path.exists(_spooled(source, post_id, thumbnail=True)):
+        os.replace(_spooled(source, post_id, thumbnail=True), _spooled(target, post_id, thumbnail=True))
+    os.rename(_spooled(source, post_id), _spooled(target, post_id))
+
+
+def _process(post_id: str) -> None:
+    try:
+        os.rename(_spooled("new", post_id), _spooled("cur", post_id))
+    except FileNotFoundError:
+        return  # claimed by another worker or process
+    os.utime(_spooled("cur", post_id))  # claim time, for orphan detection
+    thumb_path = _spooled("cur", post_id, thumbnail=True)
+    if os.path.exists(_spooled("new", post_id, thumbnail=True)):
+        os.replace(_spooled("new", post_id, thumbnail=True), thumb_path)
+
+    post_ref = firestore_config.db.collection("posts").document(post_id)
+    try:
+        try:
+            post_ref.update({"image": _upload(_spooled("cur", post_id)), "image_status": "ready"})
+        except Exception as e:
+            logger.error(f"Giving up on the image for post {post_id}: {e}")
+            post_ref.update({"image_status": "failed"})
+            return
+        if os.path.exists(thumb_path):
+            try:
+                post_ref.update({"thumbnail": _upload(thumb_path)})
+            except Exception as e:
+                logger.warning(f"No thumbnail for post {post_id}; showing the full image: {e}")
+    finally:
+        for p in (_spooled("cur", post_id), thumb_path):
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def prepare(file_storage) -> tuple:
+    """
+    Spools and validates an upload in the request thread.
+    Returns: (image path, thumbnail path or None) to pass to enqueue().
+    Raises UploadRejected if the file is too large or not an image.
+    """
+    path = spool(file_storage)
+    try:
+        return path, make_thumbnail(path)
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def enqueue(post_id: str, path: str, thumb_path: str | None) -> None:
+    """Queues a prepared image on disk and uploads it in the background to the (already written) post."""
+    for folder in ("new", "cur"):
+        os.makedirs(_dirs[folder], exist_ok=True)
+    if thumb_path:
+        os.replace(thumb_path, _spooled("new", post_id, thumbnail=True))
+    os.replace(path, _spooled("new", post_id))
+    _executor.submit(_process, post_id)
+
+
+def resume() -> None:
+    """Fails pending posts whose image is gone, then requeues images left spooled by earlier processes."""
+    for path in _dirs.values():
+        os.makedirs(path, exist_ok=True)
+
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=PENDING_TIMEOUT)
+    try:
+        pending = list(firestore_config.db.collection("posts")
+                       .where(filter=firestore.FieldFilter("image_status", "==", "pending")).stream())
+    except Exception as e:
+        logger.error(f"Could not look for posts with lost images: {e}")
+        pending = []
+    for snapshot in pending:
+        post = snapshot.to_dict()
+        spooled = any(os.path.exists(_spooled(folder, snapshot.id)) for folder in ("new", "cur"))
+        if spooled or not post.get("created") or post["created"] >= cutoff:
+            continue
+        try:
+            # Only if nobody has touched the post since it was read, e.g. another host finishing its upload
+            snapshot.reference.update({"image_status": "failed"},
+                                      option=firestore_config.db.write_option(last_update_time=snapshot.update_time))
+            logger.error(f"The image for post {snapshot.id} was lost before it was uploaded.")
+        except FailedPrecondition:
+            pass
+
+    for name in os.listdir(_dirs["cur"]):
+        if not name.endswith(".img"):
+            continue
+        try:
+            if time.time() - os.path.getmtime(os.path.join(_dirs["cur"], name)) > CLAIM_TIMEOUT:
+                _move(name[:-len(".img")], "cur", "new")
+                logger.warning(f"Requeued orphaned image {name}.")
+        except FileNotFoundError:
+            pass
+    for name in os.listdir(_dirs["new"]):
+        if name.endswith(".img"):
+            _executor.submit(_process, name[:-len(".img")])
@@ -1,9 +1,11 @@
-import os, time, logging
+import os
+from functools import partial
 from flask import Blueprint, render_template, request
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timezone
 
+from shared_cache import SharedCache
+
 news = Blueprint('news', __name__, url_prefix='/news')
 
 API_KEY = os.getenv("ALPHAVANTAGE_KEY")
@@ -11,52 +13,38 @@ TOPICS = os.getenv("AV_NEWS_TOPICS", "forex,usd,eur,gbp,jpy,CHF,cad,aud,nzd,bank
 PAGE_SIZE = int(os.getenv("AV_NEWS_PER_PAGE", 20))
 CACHE_TTL = int(os.getenv("AV_FEED_TTL", 300))
 
-_cache = {
-    'cal': {'ts': 0, 'entries': []},
-    'news': {'ts': 0, 'entries': []},
-}
+# Shared by every worker process: one fetch per key, stale entries served while it runs
+_cache = SharedCache()
 
 def fetch_calendar(date_filter=None):
-    """Grab Investing.com economic calendar via scraping."""
-    now = time.time()
-    if now - _cache['cal']['ts'] < CACHE_TTL:
-        return _cache['cal']['entries']
-
+    """Grab Investing.com economic calendar via scraping, cached per date."""
     from ff_feeds import fetch_economic_calendar
-    entries = fetch_economic_calendar(date_filter)
-    _cache['cal'] = {'ts': now, 'entries': entries}
-    return entries
-
-def fetch_news():
-    """Grab Alpha Vantage news sentiment on your topics."""
-    now = time.time()
-    if now - _cache['news']['ts'] < CACHE_TTL:
-        return _cache['news']['entries']
+    key = f"calendar:{date_filter.isoformat() if date_filter else 'all'}"
+    return _cache.get(key, partial(fetch_economic_calendar, date_filter), ttl=CACHE_TTL, default=[])
 
+def _load_news():
     URL = "https://www.alphavantage.co/query"
     params = {
         "function": "NEWS_SENTIMENT",
         "topics": ",".join(TOPICS),
         "apikey": API_KEY,
     }
-    try:
-        resp = requests.get(URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json().get("feed", [])
-        for it in data:
-            t = it.get("time_published") or it.get("published_at") or it.get("time")
-            try:
-                dt = datetime.fromisoformat(t.replace("Z", "+00:00"))
-                it["published"] = dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-            except:
-                it["published"] = t or ""
-        entries = data
-    except Exception as e:
-        logging.warning(f"[news] news fetch failed: {e}")
-        entries = _cache['news']['entries']
+    resp = requests.get(URL, params=params, timeout=10)
+    resp.raise_for_status()
+    data = resp.json().get("feed", [])
+    for it in data:
+        t = it.get("time_published") or it.get("published_at") or it.get("time")
+        try:
+            dt = datetime.fromisoformat(t.replace("Z", "+00:00"))
+            it["published"] = dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        except:
+            it["published"] = t or ""
+    return data
 
-    _cache['news'] = {'ts': now, 'entries': entries}
-    return entries
+def fetch_news():
+    """Grab Alpha Vantage news sentiment on your topics."""
+    # A failed fetch raises inside the cache, which keeps serving the last good feed
+    return _cache.get("news", _load_news, ttl=CACHE_TTL, default=[])
 
 @news.route("/")
 @news.route("/page/<int:page>")
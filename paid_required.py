@@ -1,11 +1,19 @@
 from functools import wraps
-from flask import redirect, url_for, flash
+from flask import redirect, url_for, flash, session, g
 from flask_login import current_user
 from datetime import datetime
+import entitlements
 
 def paid_required(f):
     @wraps(f)
     def wrapped(*args, **kwargs):
+        # A valid signed claim settles access without loading the user; views read g.uid, not current_user
+        uid = session.get('_user_id')
+        claim = entitlements.claim(uid)
+        if claim:
+            g.uid, g.paid_until = uid, claim["until"]
+            return f(*args, **kwargs)
+
         # Ensure user is logged in
         if not current_user.is_authenticated:
             flash("Please log in to access this page.", "warning")
@@ -13,8 +21,11 @@ def paid_required(f):
 
         # Check payment status
         if not current_user.is_paid:
+            entitlements.clear()
             flash("Your access has expired. Please renew your code or make a payment.", "warning")
             return redirect(url_for('auth.apply_code'))
 
+        claim = entitlements.issue(current_user)
+        g.uid, g.paid_until = current_user.id, claim["until"] if claim else None
         return f(*args, **kwargs)
     return wrapped
\ No newline at end of file
@@ -0,0 +1,195 @@
+#
+#  --- Paystack Payments ---
+#
+#  Registration starts a transaction through a pooled HTTP session and records
+#  payments/<reference> as "pending" (uid, email, amount). Paystack then calls
+#  /payments/webhook with a signed charge.success event, settled inside the request in
+#  one Firestore transaction: repeated deliveries activate the user and send the access
+#  code exactly once, and a failure answers 500 so Paystack redelivers the event.
+#  The browser's callback (auth.verify) only reads the settled payment document.
+#
+#  PAYSTACK_BASE_URL points the client elsewhere, e.g. the local stub:
+#      python paystack_stub.py --port 8766 --webhook http://localhost:5000/payments/webhook
+#      PAYSTACK_BASE_URL=http://localhost:8766 PAYSTACK_SK=sk_test_stub python app.py
+#
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import requests
+from firebase_admin import firestore
+from flask import Blueprint, request
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import entitlements
+import firestore_config
+from mail_outbox import outbox
+from user import user_cache
+
+PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co").rstrip("/")
+PAYSTACK_TIMEOUT = (5, 15)  # Seconds to connect, seconds to read
+PAYSTACK_POOL_SIZE = 10
+SUBSCRIPTION_DAYS = 30
+PRICE_NGN = Decimal(os.getenv("PRICE_NGN", "15000"))  # Price of one subscription period; never taken from the client
+PRICE_KOBO = int(PRICE_NGN * 100)
+
+COLLECTION = "payments"
+
+logger = logging.getLogger(__name__)
+
+payments = Blueprint('payments', __name__)
+
+
+class PaystackError(RuntimeError):
+    """Paystack rejected a request or could not be reached."""
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    # Only idempotent reads are retried; a repeated POST could start a second transaction
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=PAYSTACK_POOL_SIZE, pool_maxsize=PAYSTACK_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = _make_session()
+
+
+def _headers() -> dict:
+    return {"Authorization": f"Bearer {os.getenv('PAYSTACK_SK')}", "Content-Type": "application/json"}
+
+
+def _ref(reference: str):
+    return firestore_config.db.collection(COLLECTION).document(reference)
+
+
+def new_reference() -> str:
+    return uuid.uuid4().hex
+
+
+def initialize(uid: str, email: str, amount_kobo: int, reference: str, callback_url: str) -> str:
+    """
+    Records the pending payment and starts a Paystack transaction for it.
+    Returns: the authorization URL to send the user to.
+    Raises PaystackError if Paystack cannot be reached or declines.
+    """
+    _ref(reference).set({
+        "uid": uid,
+        "email": email,
+        "amount": amount_kobo,
+        "status": "pending",
+        "created": datetime.utcnow().isoformat(),
+    })
+    payload = {
+        "amount": amount_kobo,
+        "email": email,
+        "reference": reference,
+        "callback_url": callback_url,
+        "metadata": {"uid": uid},
+    }
+    try:
+        resp = _session.post(f"{PAYSTACK_BASE_URL}/transaction/initialize", json=payload, headers=_headers(),
+                             timeout=PAYSTACK_TIMEOUT)
+        resp_data = resp.json()
+    except (requests.RequestException, ValueError) as e:
+        raise PaystackError(f"Paystack is unreachable: {e}") from e
+
+    if not resp_data.get("status"):
+        raise PaystackError(resp_data.get("message", "Unknown error"))
+    auth_url = resp_data.get("data", {}).get("authorization_url")
+    if not auth_url:
+        raise PaystackError(f"Missing authorization_url in Paystack response: {resp_data}")
+    return auth_url
+
+
+def get(reference: str) -> dict | None:
+    """The recorded payment for `reference` (its "status" is pending, success or failed), or None."""
+    if not reference:
+        return None
+    snapshot = _ref(str(reference)).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+def valid_signature(body: bytes, signature: str | None) -> bool:
+    """True if `signature` is the HMAC-SHA512 of the raw request body under the Paystack secret key."""
+    secret = os.getenv("PAYSTACK_SK")
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+@firestore.transactional
+def _settle_in(transaction, payment_ref, charge: dict) -> dict | None:
+    """Marks the payment settled and activates its user. Returns what to email, or None if already done."""
+    snapshot = payment_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        logger.warning(f"charge.success for unknown reference {payment_ref.id}.")
+        return None
+    payment = snapshot.to_dict()
+    if payment.get("status") != "pending":
+        return None  # a repeated delivery
+
+    now = datetime.utcnow()
+    if charge.get("amount", 0) < payment.get("amount", 0) or charge.get("currency", "NGN") != "NGN":
+        logger.error(f"Payment {payment_ref.id} paid {charge.get('amount')} {charge.get('currency')}, "
+                     f"expected {payment.get('amount')} NGN.")
+        transaction.update(payment_ref, {"status": "failed", "settled": now.isoformat(), "reason": "amount"})
+        return None
+
+    paid_until = (now + timedelta(days=SUBSCRIPTION_DAYS)).isoformat()
+    code = str(uuid.uuid4())[:8]
+    transaction.update(firestore_config.db.collection('users').document(payment["uid"]), {
+        'paid_until': paid_until,
+        'has_paid': True,
+        'code_issued': code,
+        'code_expires': paid_until
+    })
+    transaction.update(payment_ref, {"status": "success", "settled": now.isoformat(), "paystack_id": charge.get("id")})
+    return {"uid": payment["uid"], "email": payment["email"], "code": code}
+
+
+def settle(reference: str, charge: dict) -> bool:
+    """Applies a successful charge once. Returns True if this call activated the user."""
+    activated = _settle_in(firestore_config.db.transaction(), _ref(reference), charge)
+    if activated is None:
+        return False
+    user_cache.invalidate(activated["uid"])
+    entitlements.revoke(activated["uid"])
+    outbox.enqueue(activated["email"], 'Your ForexSignal Access Code',
+                   f'Your {SUBSCRIPTION_DAYS}-day access code is: {activated["code"]}')
+    logger.info(f"Payment {reference} settled for user {activated['uid']}.")
+    return True
+
+
+@payments.route('/webhook', methods=['POST'])
+def webhook():
+    body = request.get_data()
+    if not valid_signature(body, request.headers.get('x-paystack-signature')):
+        logger.warning("Rejected a Paystack webhook with a bad signature.")
+        return "", 401
+
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return "", 400
+
+    if event.get("event") == "charge.success":
+        charge = event.get("data") or {}
+        if charge.get("status") == "success" and charge.get("reference"):
+            try:
+                settle(str(charge["reference"]), charge)
+            except Exception as e:
+                # Paystack redelivers events that are not answered with 200
+                logger.error(f"Settling payment {charge['reference']} failed; awaiting redelivery: {e}")
+                return "", 500
+    return "", 200
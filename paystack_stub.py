@@ -0,0 +1,156 @@
+#
+#  --- Local Paystack Stand-in ---
+#
+#  An HTTP server speaking the part of the Paystack API the app uses:
+#  POST /transaction/initialize and GET /transaction/verify/<reference>. Its
+#  authorization URL (/pay/<reference>) "pays" at once: it posts a charge.success
+#  webhook signed with PAYSTACK_SK to --webhook, then redirects to the callback URL
+#  the way Paystack does.
+#
+#  Usage:
+#      PAYSTACK_SK=sk_test_stub python paystack_stub.py --port 8766 --webhook http://localhost:5000/payments/webhook
+#      PAYSTACK_BASE_URL=http://localhost:8766 PAYSTACK_SK=sk_test_stub python app.py
+#
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def sign(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+
+
+class PaystackStub(ThreadingHTTPServer):
+    """Keeps initialized transactions in memory and delivers their webhooks."""
+
+    def __init__(self, address, secret: str, webhook_url: str | None, deliveries: int = 1, webhook_delay: float = 0.0):
+        super().__init__(address, StubHandler)
+        self.secret = secret
+        self.webhook_url = webhook_url
+        self.deliveries = deliveries
+        self.webhook_delay = webhook_delay
+        self.transactions = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def deliver_webhook(self, tx: dict) -> None:
+        if not self.webhook_url:
+            return
+        body = json.dumps({"event": "charge.success", "data": tx}).encode()
+        headers = {"Content-Type": "application/json", "x-paystack-signature": sign(body, self.secret)}
+        time.sleep(self.webhook_delay)
+        for _ in range(self.deliveries):  # Paystack may deliver an event more than once
+            try:
+                resp = requests.post(self.webhook_url, data=body, headers=headers, timeout=10)
+                logger.info(f"Webhook for {tx['reference']} answered {resp.status_code}.")
+            except requests.RequestException as e:
+                logger.error(f"Webhook for {tx['reference']} failed: {e}")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: PaystackStub
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Authorization") == f"Bearer {self.server.secret}":
+            return True
+        self._reply(401, {"status": False, "message": "Invalid key"})
+        return False
+
+    def do_POST(self):
+        if self.path != "/transaction/initialize":
+            return self._reply(404, {"status": False, "message": "Not found"})
+        if not self._authorized():
+            return
+        data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not data.get("email") or not data.get("amount"):
+            return self._reply(400, {"status": False, "message": "email and amount are required"})
+
+        reference = str(data.get("reference") or uuid.uuid4().hex)
+        with self.server.lock:
+            if reference in self.server.transactions:
+                return self._reply(400, {"status": False, "message": "Duplicate Transaction Reference"})
+            self.server.transactions[reference] = {
+                "id": len(self.server.transactions) + 1,
+                "reference": reference,
+                "amount": int(data["amount"]),
+                "currency": "NGN",
+                "status": "abandoned",
+                "customer": {"email": data["email"]},
+                "metadata": data.get("metadata"),
+                "callback_url": data.get("callback_url"),
+            }
+        self._reply(200, {"status": True, "message": "Authorization URL created", "data": {
+            "authorization_url": f"{self.server.base_url}/pay/{reference}",
+            "access_code": uuid.uuid4().hex[:15],
+            "reference": reference,
+        }})
+
+    def do_GET(self):
+        if self.path.startswith("/transaction/verify/"):
+            if not self._authorized():
+                return
+            tx = self.server.transactions.get(self.path.rsplit("/", 1)[1])
+            if tx is None:
+                return self._reply(404, {"status": False, "message": "Transaction reference not found"})
+            return self._reply(200, {"status": True, "message": "Verification successful", "data": tx})
+
+        if self.path.startswith("/pay/"):
+            reference = self.path.rsplit("/", 1)[1]
+            with self.server.lock:
+                tx = self.server.transactions.get(reference)
+                if tx is not None:
+                    tx.update(status="success", paid_at=datetime.now(timezone.utc).isoformat())
+            if tx is None:
+                return self._reply(404, {"status": False, "message": "Transaction reference not found"})
+            threading.Thread(target=self.server.deliver_webhook, args=(dict(tx),), daemon=True).start()
+            self.send_response(302)
+            self.send_header("Location", f"{tx['callback_url']}?{urlencode({'trxref': reference, 'reference': reference})}")
+            self.end_headers()
+            return
+
+        self._reply(404, {"status": False, "message": "Not found"})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Paystack API.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--webhook", help="URL that receives the signed charge.success events")
+    parser.add_argument("--deliveries", type=int, default=1, help="Times each webhook is delivered")
+    parser.add_argument("--webhook-delay", type=float, default=0.0, help="Seconds before a webhook is sent")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    secret = os.getenv("PAYSTACK_SK", "sk_test_stub")
+    server = PaystackStub((args.host, args.port), secret, args.webhook, args.deliveries, args.webhook_delay)
+    logger.info(f"Paystack stub on {server.base_url}, webhooks to {args.webhook or 'nowhere'}.")
+    server.serve_forever()
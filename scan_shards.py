@@ -0,0 +1,126 @@
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+SHARD_TIMEOUT = 240  # Seconds a shard may take for one cycle before it is restarted
+
+
+def run_shard(index: int, conn) -> None:
+    """
+    Shard process entry point. Keeps its own Deriv connection, candle buffers and indicator
+    engines for its symbols. Each request is the list of symbols to scan in this cycle; the
+    candidates for them are sent back. A None request (or the coordinator going away) ends the process.
+    """
+    import scanner  # imported here: scanner itself imports this module
+
+    async def serve() -> None:
+        api = None
+        while True:
+            symbols = await asyncio.to_thread(conn.recv)
+            if symbols is None:
+                break
+            try:
+                if api is None:
+                    api = await scanner.connect_api()
+                signals = await scanner.scan_candidates(api, symbols) if symbols else []
+            except Exception as e:
+                logger.error(f"Shard {index} scan failed: {e}")
+                if api is not None:
+                    # Close the broken connection's websocket before reconnecting on the next cycle
+                    with contextlib.suppress(Exception):
+                        await api.disconnect()
+                api = None
+                signals = [None] * len(symbols)
+            conn.send(signals)
+        if api:
+            await api.disconnect()
+
+    try:
+        asyncio.run(serve())
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+class ScanShards:
+    """
+    Spreads symbols round-robin over long-lived worker processes, one event loop each, so indicator
+    work runs on several cores. A symbol always goes to the same shard, which keeps its cached
+    candles and indicator state between cycles. The coordinator only merges the shards' candidates.
+    """
+
+    def __init__(self, symbols: list, shards: int, timeout: float = SHARD_TIMEOUT):
+        self.symbols = symbols
+        self.shards = max(1, min(shards, len(symbols)))
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("spawn")  # the web process runs other threads
+        self._workers = [None] * self.shards
+
+    def _start(self, index: int) -> None:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=run_shard, args=(index, child),
+                                        name=f"scan-shard-{index}", daemon=True)
+        process.start()
+        child.close()
+        self._workers[index] = (process, parent)
+
+    def _restart(self, index: int) -> None:
+        process, conn = self._workers[index]
+        process.kill()
+        process.join(5)
+        conn.close()
+        self._start(index)
+
+    def _collect(self, index: int) -> list:
+        _, conn = self._workers[index]
+        if not conn.poll(self.timeout):
+            raise TimeoutError(f"no result after {self.timeout:.0f}s")
+        return conn.recv()
+
+    def start(self) -> None:
+        for index in range(self.shards):
+            self._start(index)
+
+    async def scan(self, symbols: list | None = None) -> list:
+        """
+        Runs one cycle on every shard in parallel, for `symbols` (default: all of them), each on
+        the shard that owns it. A shard that dies or times out is restarted and only its own
+        symbols miss the cycle.
+        Returns: one signal (or None) per symbol, in `symbols` order.
+        """
+        symbols = self.symbols if symbols is None else symbols
+        wanted = set(symbols)
+        batches = [[s for s in self.symbols[index::self.shards] if s in wanted] for index in range(self.shards)]
+        for index, (process, conn) in enumerate(self._workers):
+            if not process.is_alive():
+                logger.warning(f"Scan shard {index} exited (code {process.exitcode}); restarting it.")
+                self._restart(index)
+            self._workers[index][1].send(batches[index])
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._collect, index) for index in range(self.shards)),
+            return_exceptions=True,
+        )
+
+        found = {}
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Scan shard {index} failed: {result!r}; restarting it.")
+                self._restart(index)
+                continue
+            found.update(zip(batches[index], result))
+        return [found.get(symbol) for symbol in symbols]
+
+    def stop(self) -> None:
+        for process, conn in self._workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process, conn in self._workers:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+            conn.close()
@@ -13,7 +13,9 @@
 #
 
 import os
+import time
 import asyncio
+from functools import partial
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import logging
@@ -27,6 +29,14 @@ from deriv_api.errors import ResponseError
 from dotenv import load_dotenv
 
 import firestore_config
+import leader
+import market_sessions
+from candles import CandleCache
+from candle_store import CandleStore
+from candle_stream import CandleStream
+from indicators import IndicatorEngine, batch_indicators
+from scan_shards import ScanShards
+from signal_sink import SignalSink
 
 # --- Configuration ---
 
@@ -34,6 +44,7 @@ load_dotenv()
 
 # --- API and Account Settings ---
 API_TOKEN = os.getenv("DERIV_TOKEN")
+DERIV_ENDPOINT = os.getenv("DERIV_ENDPOINT", "ws.derivws.com")  # e.g. ws://localhost:8765 for fake_deriv.py
 INITIAL_CAPITAL = float(os.getenv("CAPITAL", "10000"))
 
 # --- Strategy Parameters ---
@@ -50,6 +61,18 @@ MA_LONG, MA_SHORT = 200, 20
 RSI_LEN, SMA_LEN = 16, 16
 MACD_FAST, MACD_SLOW, MACD_SIGNAL = 4, 24, 16
 
+# Bars before every indicator has a value (the first row compute_indicators keeps after dropna)
+INDICATOR_WARMUP = max(MA_LONG, MA_SHORT, SMA_LEN, RSI_LEN + 1, MACD_SLOW + MACD_SIGNAL - 1)
+# Further bars the RSI/MACD averages need to forget their seed, so a fresh pandas_ta frame over the
+# window and an IndicatorEngine with a longer history agree on the latest values
+INDICATOR_SETTLE_BARS = 200
+MIN_VALID_ROWS = INDICATOR_SETTLE_BARS + 1  # Rows with every indicator defined before a symbol can signal
+MIN_BARS = INDICATOR_WARMUP + INDICATOR_SETTLE_BARS  # 5-minute bars a symbol needs to be analyzed at all
+CANDLE_WINDOW = MIN_BARS + 1  # 5-minute bars fetched and buffered: MIN_BARS closed ones plus the forming one
+
+# "incremental" (per-symbol IndicatorEngine), "batch" (all symbols as one NumPy array) or "pandas" (pandas_ta)
+INDICATOR_MODE = os.getenv("SCAN_INDICATORS", "incremental")
+
 # --- Fibonacci Levels for Analysis ---
 # Key: Entry level, Value: Target level
 FIB_LEVELS = {
@@ -67,6 +90,19 @@ SYMBOLS = [
     "1HZ25V", "1HZ50V", "1HZ75V", "1HZ100V", "1HZ150V", "1HZ250V", "JD10", "JD25",
     "JD50", "JD75", "JD100",
 ]
+if os.getenv("SCAN_SYMBOLS"):  # Comma-separated override, e.g. for load tests against fake_deriv.py
+    SYMBOLS = os.getenv("SCAN_SYMBOLS").split(",")
+
+# --- Scan Concurrency Settings ---
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "8"))  # Symbols fetched in parallel (1 = serial scan)
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))  # Seconds before a single candle request is abandoned
+SCAN_SHARDS = int(os.getenv("SCAN_SHARDS", "1"))  # Worker processes the symbols are split across (1 = in-process)
+
+# --- Scan Mode Settings ---
+SCAN_MODE = os.getenv("SCAN_MODE", "poll")  # "poll" (scan after every 5-minute close) or "stream" (OHLC subscriptions)
+STREAM_SETTLE_SECONDS = float(os.getenv("STREAM_SETTLE_SECONDS", "5"))  # Wait for other symbols' bars before picking the best
+STREAM_STALE_SECONDS = float(os.getenv("STREAM_STALE_SECONDS", "90"))  # Silence after which the stream counts as dropped
+BAR_SETTLE_SECONDS = float(os.getenv("BAR_SETTLE_SECONDS", "3"))  # Polling scans start this long after each 5-minute close
 
 # --- Firestore Settings ---
 SAVE_TO_DB_THRESHOLD = 3 # Only save signals with a score of 3 ("High")
@@ -75,6 +111,15 @@ SAVE_TO_DB_THRESHOLD = 3 # Only save signals with a score of 3 ("High")
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Rolling per-symbol candle buffers, reused across scan cycles and warm-started from disk
+candle_cache = CandleCache(CandleStore() if os.getenv("CANDLE_STORE", "1") == "1" else None)
+
+# Per-symbol 5-minute indicator state, kept in step with candle_cache
+indicator_engines = {}
+
+# Queued, batched Firestore writer for high-quality signals
+signal_sink = SignalSink("signals", materialize_latest=True)
+
 
 def get_pip_value(symbol: str) -> float:
     """Returns the value of a single pip for a given symbol."""
@@ -86,39 +131,49 @@ def get_pip_value(symbol: str) -> float:
 
 
 async def fetch_live_candles(api: DerivAPI, symbol: str, granularity: int, count: int) -> pd.DataFrame:
-    """Fetches historical candle data from the Deriv API."""
-    end_time = int(datetime.now().timestamp())
-    req = {
-        "ticks_history": symbol,
-        "style": "candles",
-        "granularity": granularity,
-        "count": count,
-        "end": end_time,
-        "adjust_start_time": 1
-    }
+    """
+    Returns the latest `count` candles from the Deriv API.
+    The first call per symbol/granularity downloads the full history; later calls only request
+    bars from the last stored epoch onwards and merge them into the cached buffer.
+    """
+    buffer = candle_cache.buffer(symbol, granularity, count)
+    req = buffer.next_request()
     try:
-        resp = await api.send(req)
-        df = pd.DataFrame(resp.get("candles", []))
-        if df.empty:
+        resp = await asyncio.wait_for(api.send(req), timeout=FETCH_TIMEOUT)
+        buffer.merge(resp.get("candles", []))
+        candle_cache.record(buffer)
+        if buffer.empty:
             logger.debug(f"No candles returned for {symbol}")
             return pd.DataFrame()
-        df["epoch"] = pd.to_datetime(df["epoch"], unit="s")
-        return df.set_index("epoch").sort_index()
+        return buffer.to_frame()
     except ResponseError as e:
         logger.error(f"API Error fetching candles for {symbol}: {e}")
         return pd.DataFrame()
+    except asyncio.TimeoutError:
+        logger.warning(f"Timed out after {FETCH_TIMEOUT:.0f}s fetching {granularity}s candles for {symbol}")
+        return pd.DataFrame()
 
 
-def compute_indicators(df2h: pd.DataFrame, df5m: pd.DataFrame) -> (pd.DataFrame, dict):
-    """Calculates all required technical indicators and Fibonacci levels."""
-    # 1. Calculate Fibonacci levels from the 2-hour chart swing
+def compute_fib_levels(df2h: pd.DataFrame) -> dict:
+    """Calculates the Fibonacci levels of the 2-hour chart swing."""
     swing = df2h.iloc[-50:]
-    hi, lo = swing["high"].max(), swing["low"].min()
+    return fib_levels_from_swing(swing["high"].max(), swing["low"].min())
+
+
+def fib_levels_from_swing(hi: float, lo: float) -> dict:
+    """Maps each Fibonacci level to its price within the swing from `lo` to `hi`."""
     fibs = {lvl: lo + lvl * (hi - lo) for lvl in FIB_LEVELS}
-    
+
     # Also add the swing high and low to the fibs dictionary for potential use
     fibs[0.0] = lo
     fibs[1.0] = hi
+    return fibs
+
+
+def compute_indicators(df2h: pd.DataFrame, df5m: pd.DataFrame) -> (pd.DataFrame, dict):
+    """Calculates all required technical indicators and Fibonacci levels."""
+    # 1. Calculate Fibonacci levels from the 2-hour chart swing
+    fibs = compute_fib_levels(df2h)
 
     # 2. Calculate technical indicators on the 5-minute chart
     df = df5m.copy()
@@ -131,15 +186,28 @@ def compute_indicators(df2h: pd.DataFrame, df5m: pd.DataFrame) -> (pd.DataFrame,
     return df.join(macd).dropna(), fibs
 
 
-def analyze_signal_for_symbol(df: pd.DataFrame, fibs: dict, equity: float, symbol: str) -> dict | None:
+def update_indicator_engine(symbol: str, df5m: pd.DataFrame) -> IndicatorEngine:
+    """Brings the symbol's IndicatorEngine up to date with its latest 5-minute candles."""
+    engine = indicator_engines.get(symbol)
+    if engine is None:
+        engine = indicator_engines[symbol] = IndicatorEngine(
+            MA_LONG, MA_SHORT, RSI_LEN, SMA_LEN, MACD_FAST, MACD_SLOW, MACD_SIGNAL
+        )
+    engine.sync(df5m.index.asi8 // 10**9, df5m["close"].to_numpy())
+    return engine
+
+
+def analyze_signal_for_symbol(df: pd.DataFrame | IndicatorEngine, fibs: dict, equity: float,
+                              symbol: str) -> dict | None:
     """
     Analyzes the latest candle data against the strategy rules and returns a scored signal.
+    `df` is either the compute_indicators frame or an up-to-date IndicatorEngine.
     Returns: A dictionary with the signal details or None.
     """
-    if df.empty or len(df) < MA_LONG:
+    if len(df) < MIN_VALID_ROWS:
         return None
 
-    last = df.iloc[-1]
+    last = df.latest() if isinstance(df, IndicatorEngine) else df.iloc[-1]
     price = last["close"]
 
     for lvl, lvl_price in fibs.items():
@@ -168,87 +236,319 @@ def analyze_signal_for_symbol(df: pd.DataFrame, fibs: dict, equity: float, symbo
             
             # --- Determine Signal Strength and Finalize ---
             if direction:
-                signal_strength_map = {1: "Low", 2: "Medium", 3: "High"}
-                signal_strength = signal_strength_map.get(score, "Low")
-
-                # Calculate Trade Parameters
-                pip_value = get_pip_value(symbol)
-                sl_pips = STOP_LOSS_PIPS.get(symbol, STOP_LOSS_PIPS["DEFAULT"])
-                adverse_distance = sl_pips * pip_value
-                
-                sl = price - adverse_distance if direction == "BUY" else price + adverse_distance
-                tp = price + (adverse_distance * RRR) if direction == "BUY" else price - (adverse_distance * RRR)
-
-                return {
-                    "symbol": symbol,
-                    "strength": signal_strength,
-                    "score": score,
-                    "direction": direction,
-                    "entry_price": price,
-                    "tp": tp,
-                    "stop_loss": sl,
-                    "stake": equity * RISK_PCT,
-                    "timestamp": datetime.now(ZoneInfo("Africa/Lagos")).isoformat()
-                }
+                return build_signal(symbol, direction, score, price, equity)
 
     return None
 
 
-async def scan_signals_once():
-    """Main function to run the scanning loop."""
-    logger.info("Connecting to Deriv API...")
-    api = DerivAPI(app_id=os.getenv("DERIV_APP_ID", "1"), access_token=API_TOKEN)
+def build_signal(symbol: str, direction: str, score: int, price: float, equity: float) -> dict:
+    """Turns a scored setup into the signal dictionary with its trade parameters."""
+    signal_strength_map = {1: "Low", 2: "Medium", 3: "High"}
+    signal_strength = signal_strength_map.get(score, "Low")
+
+    # Calculate Trade Parameters
+    pip_value = get_pip_value(symbol)
+    sl_pips = STOP_LOSS_PIPS.get(symbol, STOP_LOSS_PIPS["DEFAULT"])
+    adverse_distance = sl_pips * pip_value
+
+    sl = price - adverse_distance if direction == "BUY" else price + adverse_distance
+    tp = price + (adverse_distance * RRR) if direction == "BUY" else price - (adverse_distance * RRR)
+
+    return {
+        "symbol": symbol,
+        "strength": signal_strength,
+        "score": score,
+        "direction": direction,
+        "entry_price": price,
+        "tp": tp,
+        "stop_loss": sl,
+        "stake": equity * RISK_PCT,
+        "timestamp": datetime.now(ZoneInfo("Africa/Lagos")).isoformat()
+    }
+
+
+def analyze_signals_batch(symbols: list, frames: dict, equity: float) -> list:
+    """
+    Vectorized counterpart of compute_indicators + analyze_signal_for_symbol for many symbols.
+    `frames` maps each symbol to its (df2h, df5m) pair. The closes of all symbols are stacked into one
+    (symbols x bars) array, every indicator and rule is evaluated as an array operation, and the
+    result is one signal dict (or None) per symbol, in `symbols` order.
+    """
+    results = [None] * len(symbols)
+    usable = [i for i, symbol in enumerate(symbols)
+              if symbol in frames and not frames[symbol][0].empty
+              and not frames[symbol][1].empty and len(frames[symbol][1]) >= MIN_BARS]
+    if not usable:
+        return results
+
+    n_bars = max(len(frames[symbols[i]][1]) for i in usable)
+    closes = np.full((len(usable), n_bars), np.nan)
+    swing_hi = np.empty(len(usable))
+    swing_lo = np.empty(len(usable))
+    for row, i in enumerate(usable):
+        df2h, df5m = frames[symbols[i]]
+        close = df5m["close"].to_numpy()
+        closes[row, n_bars - len(close):] = close
+        swing = df2h.iloc[-50:]
+        swing_hi[row], swing_lo[row] = swing["high"].max(), swing["low"].min()
+
+    last = batch_indicators(closes, MA_LONG, MA_SHORT, RSI_LEN, SMA_LEN, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+    price = last["close"]
+
+    # Same level order as compute_fib_levels: the FIB_LEVELS entries, then the swing low and high
+    levels = np.array(list(FIB_LEVELS) + [0.0, 1.0])
+    fibs = swing_lo[:, None] + levels[None, :] * (swing_hi - swing_lo)[:, None]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        near_level = (np.abs(price[:, None] - fibs) / fibs < FIB_TOLERANCE).any(axis=1)
+    uptrend = (last["MACDh_4_24_16"] > 0) & (last["rsi"] > 50)
+    downtrend = ~uptrend & (last["MACDh_4_24_16"] < 0) & (last["rsi"] < 50)
+    confirmed = (uptrend & (price > last["ma_long"])) | (downtrend & (price < last["ma_long"]))
+    score = 2 + confirmed.astype(int)
+    fires = near_level & (uptrend | downtrend) & (last["rows"] >= MIN_VALID_ROWS)
+
+    for row in np.flatnonzero(fires):
+        i = usable[row]
+        direction = "BUY" if uptrend[row] else "SELL"
+        results[i] = build_signal(symbols[i], direction, int(score[row]), float(price[row]), equity)
+    return results
+
+
+def evaluate_symbol(df2h: pd.DataFrame, df5m: pd.DataFrame, symbol: str) -> dict | None:
+    """Runs the indicator and signal rules over one symbol's candles."""
+    if df2h.empty or df5m.empty or len(df5m) < MIN_BARS:
+        logger.debug(f"Skipping {symbol} due to insufficient data.")
+        return None
+
+    if INDICATOR_MODE == "batch":  # a batch of one, e.g. a single streamed bar close
+        return analyze_signals_batch([symbol], {symbol: (df2h, df5m)}, INITIAL_CAPITAL)[0]
+
+    if INDICATOR_MODE == "pandas":
+        df_with_indicators, fib_levels = compute_indicators(df2h, df5m)
+        return analyze_signal_for_symbol(df_with_indicators, fib_levels, INITIAL_CAPITAL, symbol)
+
+    engine = update_indicator_engine(symbol, df5m)
+    return analyze_signal_for_symbol(engine, compute_fib_levels(df2h), INITIAL_CAPITAL, symbol)
+
+
+async def fetch_symbol(api: DerivAPI, symbol: str, limiter: asyncio.Semaphore) -> tuple:
+    """Fetches both timeframes for one symbol."""
+    async with limiter:
+        return await asyncio.gather(
+            fetch_live_candles(api, symbol, 7200, 50),  # 2-hour candles for swing
+            fetch_live_candles(api, symbol, 300, CANDLE_WINDOW),  # 5-min candles for entry
+        )
+
+
+async def scan_symbol(api: DerivAPI, symbol: str, limiter: asyncio.Semaphore) -> dict | None:
+    """Fetches both timeframes for one symbol and returns its signal, if any."""
+    df2h, df5m = await fetch_symbol(api, symbol, limiter)
+    return evaluate_symbol(df2h, df5m, symbol)
+
+
+def pick_best_signal(signals: list) -> dict | None:
+    """
+    Returns the highest-scoring signal. Ties go to the earliest entry, so passing
+    signals in SYMBOLS order keeps the choice independent of fetch completion order.
+    """
+    best_signal = None
+    for signal in signals:
+        if signal and (best_signal is None or signal["score"] > best_signal["score"]):
+            best_signal = signal
+    return best_signal
+
+
+async def scan_candidates(api: DerivAPI, symbols: list = SYMBOLS) -> list:
+    """
+    Scans all symbols concurrently (at most SCAN_CONCURRENCY at a time).
+    A slow or failing symbol only loses its own result; it never holds up the others.
+    Returns: one signal (or None) per symbol, in `symbols` order.
+    """
+    started = time.perf_counter()
+    limiter = asyncio.Semaphore(max(1, SCAN_CONCURRENCY))
+    scan = fetch_symbol if INDICATOR_MODE == "batch" else scan_symbol
+    results = await asyncio.gather(
+        *(scan(api, symbol, limiter) for symbol in symbols),
+        return_exceptions=True,
+    )
+
+    completed = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception):
+            logger.error(f"Scan failed for {symbol}: {result}")
+            continue
+        completed[symbol] = result
+
+    if INDICATOR_MODE == "batch":
+        signals = analyze_signals_batch(symbols, completed, INITIAL_CAPITAL)
+    else:
+        signals = [completed.get(symbol) for symbol in symbols]
+
+    logger.info(f"Scanned {len(symbols)} symbols in {time.perf_counter() - started:.2f}s "
+                f"(concurrency {SCAN_CONCURRENCY}).")
+    return signals
+
+
+async def scan_cycle(api: DerivAPI, symbols: list = SYMBOLS) -> dict | None:
+    """Scans all symbols and returns the best signal."""
+    return pick_best_signal(await scan_candidates(api, symbols))
+
+
+async def sleep_until_bar_close() -> int:
+    """
+    Sleeps until the next 5-minute candle has closed (plus BAR_SETTLE_SECONDS).
+    Returns: the open epoch of the bar that closed.
+    """
+    closes_at = market_sessions.next_bar_close(300, BAR_SETTLE_SECONDS)
+    await asyncio.sleep(max(0.0, closes_at - time.time()))
+    return int(closes_at - BAR_SETTLE_SECONDS) - 300
+
+
+def report_signal(best_signal: dict | None) -> None:
+    """Logs the best signal of a cycle and queues it for Firestore if it is high quality."""
+    if best_signal:
+        logger.info(f"Found Best Signal: [{best_signal['strength'].upper()} SIGNAL] for {best_signal['symbol']} "
+                    f"(Score: {best_signal['score']}/3) -> {best_signal['direction']}")
+
+        # Save to database only if it's a high-quality signal
+        if best_signal["score"] >= SAVE_TO_DB_THRESHOLD:
+            signal_sink.put(best_signal)
+    else:
+        logger.info(f"No qualifying signal found across all symbols in this cycle.")
+
+
+async def connect_api() -> DerivAPI:
+    """Opens and authorizes a Deriv API connection."""
+    api = DerivAPI(endpoint=DERIV_ENDPOINT, app_id=os.getenv("DERIV_APP_ID", "1"), access_token=API_TOKEN)
     await api.authorize({"authorize": API_TOKEN})
-    logger.info("Connection successful. Starting scanner...")
+    return api
 
-    while True:
-        now = datetime.now(ZoneInfo("Africa/Lagos"))
-        if now.hour >= 22 or now.hour < 8:
-            logger.info(f"Outside trading hours ({now.strftime('%H:%M')}). Sleeping for 5 minutes.")
-            await asyncio.sleep(300)
+
+async def analyze_closed_bar(api: DerivAPI, symbol: str) -> dict | None:
+    """Analyzes a symbol on its streamed 5-minute candles, up to and including the bar that just closed."""
+    df2h = await fetch_live_candles(api, symbol, 7200, 50)
+    df5m = candle_cache.buffer(symbol, 300, CANDLE_WINDOW).to_frame().iloc[:-1]  # drop the bar that just opened
+    return evaluate_symbol(df2h, df5m, symbol)
+
+
+async def report_bar_close(batches: dict, epoch: int) -> None:
+    """
+    Waits for the other symbols' bars to close, then reports the best signal of the batch.
+    The batch is taken out of `batches` before it is gathered, so a close that arrives later starts a new one.
+    """
+    try:
+        await asyncio.sleep(STREAM_SETTLE_SECONDS)
+    finally:
+        batch = batches.pop(epoch, {})
+    symbols = sorted(batch, key=SYMBOLS.index)
+    results = await asyncio.gather(*(batch[symbol] for symbol in symbols), return_exceptions=True)
+
+    signals = []
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception):
+            logger.error(f"Analysis failed for {symbol}: {result}")
             continue
+        signals.append(result)
+    report_signal(pick_best_signal(signals))
 
-        best_signal = None
 
-        for symbol in SYMBOLS:
-            df2h = await fetch_live_candles(api, symbol, 7200, 50)  # 2-hour candles for swing
-            df5m = await fetch_live_candles(api, symbol, 300, MA_LONG + 50)  # 5-min candles for entry
+async def stream_signals():
+    """
+    Event-driven scanning: every symbol is analyzed the moment its 5-minute bar closes.
+    All symbols share one connection. If the stream drops, the scanner polls until it can resubscribe.
+    """
+    batches = {}  # closed bar epoch -> {symbol: analysis task}
 
-            if df2h.empty or df5m.empty or len(df5m) < MA_LONG:
-                logger.debug(f"Skipping {symbol} due to insufficient data.")
-                continue
+    def on_close(api: DerivAPI, symbol: str, epoch: int) -> None:
+        if not market_sessions.is_open(symbol, epoch):  # judged by when the bar opened, not when it closed
+            return
+        batch = batches.get(epoch)
+        if batch is None:
+            batch = batches[epoch] = {}
+            asyncio.create_task(report_bar_close(batches, epoch))
+        batch[symbol] = asyncio.create_task(analyze_closed_bar(api, symbol))
 
-            df_with_indicators, fib_levels = compute_indicators(df2h, df5m)
-            current_signal = analyze_signal_for_symbol(df_with_indicators, fib_levels, INITIAL_CAPITAL, symbol)
-
-            if current_signal:
-                # If we find a signal, check if it's better than the best one we've seen so far
-                if best_signal is None or current_signal["score"] > best_signal["score"]:
-                    best_signal = current_signal
-        
-        # After checking all symbols, report the single best one
-        if best_signal:
-            logger.info(f"Found Best Signal: [{best_signal['strength'].upper()} SIGNAL] for {best_signal['symbol']} "
-                        f"(Score: {best_signal['score']}/3) -> {best_signal['direction']}")
-            
-            # Save to database only if it's a high-quality signal
-            if best_signal["score"] >= SAVE_TO_DB_THRESHOLD:
-                try:
-                    firestore_config.db.collection("signals").add(best_signal)
-                    logger.info(f"High signal for {best_signal['symbol']} saved to database.")
-                except Exception as e:
-                    logger.error(f"Failed to save signal to Firestore: {e}")
+    while True:
+        try:
+            logger.info("Connecting to Deriv API for candle streaming...")
+            api = await connect_api()
+            stream = CandleStream(api, SYMBOLS, 300, candle_cache, CANDLE_WINDOW,
+                                  on_close=lambda symbol, epoch: on_close(api, symbol, epoch),
+                                  stale_after=STREAM_STALE_SECONDS)
+            await stream.start()
+            logger.info(f"Streaming 5-minute candles for {len(SYMBOLS)} symbols.")
+            await stream.wait_dropped()
+            await stream.stop()
+        except Exception as e:
+            logger.error(f"Candle stream failed: {e}")
+
+        logger.warning("Candle stream unavailable. Running a polling cycle before resubscribing...")
+        try:
+            api = await connect_api()
+            symbols = market_sessions.open_symbols(SYMBOLS, market_sessions.last_closed_bar(300))
+            if symbols:
+                report_signal(await scan_cycle(api, symbols))
+            await api.disconnect()
+        except Exception as e:
+            logger.error(f"Polling fallback failed: {e}")
+        await sleep_until_bar_close()
+
+
+async def scan_signals_once():
+    """Main function to run the scanning loop."""
+    signal_sink.start()
+    try:
+        if SCAN_MODE == "stream":
+            await stream_signals()
+        else:
+            await poll_signals()
+    finally:
+        await signal_sink.close()
+
+
+async def poll_signals():
+    """Scans the symbols whose market is open right after every 5-minute candle close."""
+    if SCAN_SHARDS > 1:
+        shards = ScanShards(SYMBOLS, SCAN_SHARDS)
+        shards.start()
+        logger.info(f"Scanning {len(SYMBOLS)} symbols across {shards.shards} shard processes.")
+        scan = shards.scan
+    else:
+        logger.info("Connecting to Deriv API...")
+        api = await connect_api()
+        logger.info("Connection successful. Starting scanner...")
+        scan = partial(scan_candidates, api)
+
+    try:
+        while True:
+            logger.info("Waiting for the next 5-minute candle...")
+            bar = await sleep_until_bar_close()
+
+            symbols = market_sessions.open_symbols(SYMBOLS, bar)  # judged by when the bar opened
+            if not symbols:
+                logger.info("All markets are closed. Skipping this candle.")
+                continue
+            if len(symbols) < len(SYMBOLS):
+                logger.info(f"Scanning {len(symbols)} of {len(SYMBOLS)} symbols; the other markets are closed.")
+
+            # After checking the open symbols, report the single best one
+            report_signal(pick_best_signal(await scan(symbols)))
+    finally:
+        if SCAN_SHARDS > 1:
+            shards.stop()
         else:
-            logger.info(f"No qualifying signal found across all symbols in this cycle.")
+            await api.disconnect()
+
 
-        logger.info("Scan complete. Waiting for the next 5-minute candle...")
-        await asyncio.sleep(300)
+async def run_scanner():
+    """Runs the scanner while this process holds the scanner lease, so one scanner runs per deployment."""
+    await leader.run_as_leader(scan_signals_once)
 
 
 if __name__ == "__main__":
     try:
         firestore_config.initialize_firestore()
-        asyncio.run(scan_signals_once())
+        asyncio.run(run_scanner())
     except Exception as e:
         logger.error(f"A critical error occurred: {e}")
 
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from flask_login import login_required, current_user
+from flask import Blueprint, render_template, request, flash, redirect, url_for, g
+from flask_login import login_required
 import firestore_config
-from user import User  # Import User class
+import identifiers
+from user import User, user_cache  # Import User class
 from datetime import datetime
 from paid_required import paid_required  # Use synced decorator
 
@@ -10,7 +11,7 @@ settings = Blueprint('settings', __name__, url_prefix='/settings')
 @settings.route('/', methods=['GET'])
 @paid_required  # Restrict access to paid users
 def view():
-    user = User.get(current_user.id)  # Fetch full user data
+    user = User.get(g.uid)  # Fetch full user data
     return render_template('settings.html', user=user)
 
 @settings.route('/profile', methods=['POST'])
@@ -21,7 +22,17 @@ def update_profile():
         'email': request.form.get('email', ''),
         'phone': request.form.get('phone', '')
     }
-    firestore_config.db.collection('users').document(current_user.id).update(data)
+    old = User.get(g.uid, cached=False)
+    taken = identifiers.taken(data['email'], data['username'], uid=g.uid)
+    if taken:
+        flash(f'That {taken} is already in use.', 'danger')
+        return redirect(url_for('settings.view'))
+    try:
+        identifiers.reindex(g.uid, {'email': old.email, 'username': old.username}, data, data)
+    except identifiers.IdentifierTaken as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('settings.view'))
+    user_cache.invalidate(g.uid)
     flash('Profile updated successfully.', 'success')
     return redirect(url_for('settings.view'))
 
@@ -29,7 +40,7 @@ def update_profile():
 @paid_required
 def send_feedback():
     feedback = {
-        'user_id': current_user.id,
+        'user_id': g.uid,
         'subject': request.form.get('subject', ''),
         'message': request.form.get('message', ''),
         'time': datetime.utcnow().isoformat()
@@ -0,0 +1,186 @@
+#
+#  --- Cross-process Feed Cache ---
+#
+#  A small SQLite-backed cache shared by every worker process on the host, for
+#  slow external feeds (news, economic calendar):
+#
+#    - fresh entries are served straight from the database;
+#    - stale entries are still served, while a single background refresh runs;
+#    - a lease row per key ("single flight") makes sure only one process/thread
+#      fetches a key at a time, and a failed fetch holds the lease for
+#      RETRY_AFTER seconds so a dead upstream is not hammered;
+#    - on a cold miss one caller loads inline and the others wait for its result.
+#
+#  Values must be JSON-serializable. SHARED_CACHE_PATH sets the database file.
+#
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "shared_cache.sqlite3")
+LEASE_TIMEOUT = 30  # Seconds a refresh may run before another process may take over
+RETRY_AFTER = 60  # Seconds before a failed fetch is retried
+MAX_AGE = 86400  # Entries not refreshed for this long are deleted
+SQLITE_TIMEOUT = 10
+POLL_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    """Stale-while-revalidate cache in SQLite with a single-flight lease per key."""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, lease_timeout: float = LEASE_TIMEOUT,
+                 retry_after: float = RETRY_AFTER, max_age: float = MAX_AGE):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.retry_after = retry_after
+        self.max_age = max_age
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shared-cache")
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._counts = {"fresh": 0, "stale": 0, "miss": 0, "loads": 0, "load_errors": 0}
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, until REAL NOT NULL,
+                                               failed INTEGER NOT NULL DEFAULT 0);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared between threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._counts[name] += 1
+
+    def _read(self, key: str) -> tuple | None:
+        """(value, fetched epoch) for `key`, or None."""
+        row = self._conn().execute("SELECT value, fetched FROM entries WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _lease(self, key: str) -> tuple | None:
+        """(until, failed) of the lease on `key` if it is still held, else None."""
+        row = self._conn().execute("SELECT until, failed FROM leases WHERE key = ?", (key,)).fetchone()
+        return row if row and row[0] > time.time() else None
+
+    def _acquire(self, key: str) -> str | None:
+        """Takes the lease on `key` unless someone holds it. Returns the owner token, or None."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # serializes lease checks across processes
+        try:
+            if self._lease(key):
+                conn.execute("ROLLBACK")
+                return None
+            owner = uuid.uuid4().hex
+            conn.execute("INSERT OR REPLACE INTO leases (key, owner, until, failed) VALUES (?, ?, ?, 0)",
+                         (key, owner, time.time() + self.lease_timeout))
+            conn.execute("COMMIT")
+            return owner
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _load(self, key: str, owner: str, loader: Callable[[], Any]) -> tuple:
+        """Runs `loader` under the lease and stores its result. Returns (ok, value)."""
+        self._count("loads")
+        try:
+            value = loader()
+            encoded = json.dumps(value)
+        except Exception as e:
+            self._count("load_errors")
+            logger.warning(f"Refreshing {key} failed, retrying in {self.retry_after}s: {e}")
+            # Keep the lease as a back-off so no other worker retries at once
+            self._conn().execute("UPDATE leases SET until = ?, failed = 1 WHERE key = ? AND owner = ?",
+                                 (time.time() + self.retry_after, key, owner))
+            return False, None
+
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, fetched) VALUES (?, ?, ?)", (key, encoded, now))
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+            conn.execute("DELETE FROM entries WHERE fetched < ?", (now - self.max_age,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True, value
+
+    def _refresh_in_background(self, key: str, owner: str, loader: Callable[[], Any]) -> None:
+        with self._refreshing_lock:
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._load(key, owner, loader)
+            except Exception as e:
+                logger.error(f"Background refresh of {key} failed: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def get(self, key: str, loader: Callable[[], Any], ttl: float, default: Any = None,
+            wait: float = LEASE_TIMEOUT) -> Any:
+        """
+        The cached value of `key`, refreshed with `loader()` once it is older than `ttl` seconds.
+        Stale values are returned immediately while one background refresh runs. On a cold miss the
+        caller holding the lease loads inline; others wait up to `wait` seconds for it, then get `default`.
+        `loader` runs on another thread for background refreshes and should raise on failure.
+        """
+        entry = self._read(key)
+        if entry is not None and time.time() - entry[1] < ttl:
+            self._count("fresh")
+            return entry[0]
+
+        with self._refreshing_lock:
+            refreshing_here = key in self._refreshing
+        owner = None if refreshing_here or self._lease(key) else self._acquire(key)
+        if entry is not None:
+            self._count("stale")
+            if owner:
+                self._refresh_in_background(key, owner, loader)
+            return entry[0]
+
+        self._count("miss")
+        deadline = time.time() + wait
+        while owner is None:
+            lease = self._lease(key)
+            if lease and lease[1]:
+                return default  # the last fetch failed; wait for RETRY_AFTER
+            if time.time() > deadline:
+                return default
+            time.sleep(POLL_INTERVAL)
+            entry = self._read(key)
+            if entry is not None:
+                return entry[0]
+            if not lease:
+                owner = self._acquire(key)  # the loader gave up its lease without a result
+
+        ok, value = self._load(key, owner, loader)
+        return value if ok else default
+
+    def invalidate(self, key: str) -> None:
+        self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._counts)
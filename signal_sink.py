@@ -0,0 +1,190 @@
+#
+#  --- Signal Sink ---
+#
+#  Persists signals to Firestore without blocking the scanner's event loop. Signals are
+#  queued, written in batches from a worker thread, retried with exponential backoff and,
+#  if Firestore stays unreachable, spilled to a local JSONL file that is replayed once
+#  writes succeed again. Every signal gets its document id when it is queued, so a retry
+#  or replay of a batch that did reach Firestore overwrites it instead of duplicating it.
+#  With `materialize_latest`, each commit also updates meta/latest_signals in the same
+#  transaction (see latest_signals.py).
+#
+
+import asyncio
+import json
+import logging
+import os
+import random
+import uuid
+
+from firebase_admin import firestore
+
+import firestore_config
+from latest_signals import latest_ref, merge_latest
+
+SIGNAL_SPILL_FILE = os.getenv("SIGNAL_SPILL_FILE", "signal_spill.jsonl")
+MAX_BATCH_WRITES = 499  # Firestore allows 500 writes per batch; one is kept for meta/latest_signals
+
+logger = logging.getLogger(__name__)
+
+
+class SignalSink:
+    """Bounded, batched, retrying Firestore writer for one collection."""
+
+    def __init__(self, collection: str, max_queue: int = 1000, batch_size: int = 50, linger: float = 0.5,
+                 max_attempts: int = 5, backoff: float = 1.0, max_backoff: float = 30.0,
+                 spill_path: str = SIGNAL_SPILL_FILE, materialize_latest: bool = False):
+        self.collection = collection
+        self.materialize_latest = materialize_latest
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES)
+        self.linger = linger  # Seconds to wait for more signals before committing a partial batch
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spill_path = spill_path
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._in_flight = []
+
+    def put(self, signal: dict) -> str:
+        """
+        Queues a signal without blocking. When the queue is full the signal goes straight to the spill file.
+        Returns: the Firestore document id the signal will be written under.
+        """
+        item = {"id": uuid.uuid4().hex, "data": signal}
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.warning(f"Signal queue full; spilling the {signal.get('symbol')} signal to disk.")
+            self._spill([item])
+        return item["id"]
+
+    def start(self) -> None:
+        """Starts the writer task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 10) -> None:
+        """Waits up to `timeout` seconds for queued signals to be written, then spills the rest."""
+        if self._task and not self._task.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        leftovers = []
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+        if leftovers:
+            self._spill(leftovers)
+
+    async def _next_batch(self) -> None:
+        """
+        Waits for one signal, then collects more for up to `linger` seconds. Each signal goes into
+        `_in_flight` as it is dequeued, so a cancellation while lingering still spills it.
+        """
+        loop = asyncio.get_running_loop()
+        self._in_flight.append(await self._queue.get())
+        deadline = loop.time() + self.linger
+        while len(self._in_flight) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                self._in_flight.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self) -> None:
+        await self._replay()
+        while True:
+            try:
+                await self._next_batch()
+                if await self._write(self._in_flight):
+                    await self._replay()
+                else:
+                    self._spill(self._in_flight)
+            except asyncio.CancelledError:
+                if self._in_flight:
+                    self._spill(self._in_flight)
+                raise
+            finally:
+                for _ in self._in_flight:
+                    self._queue.task_done()
+                self._in_flight = []
+
+    def _commit(self, items: list) -> None:
+        """Blocking batch write; runs in a worker thread."""
+        db = firestore_config.db
+        collection = db.collection(self.collection)
+        if not self.materialize_latest:
+            batch = db.batch()
+            for item in items:
+                batch.set(collection.document(item["id"]), item["data"])
+            batch.commit()
+            return
+
+        @firestore.transactional
+        def write(transaction):
+            # Read first: scanners in several processes may update the document concurrently
+            snapshot = latest_ref().get(transaction=transaction)
+            current = (snapshot.to_dict() or {}).get("signals", []) if snapshot.exists else []
+            for item in items:
+                transaction.set(collection.document(item["id"]), item["data"])
+            transaction.set(latest_ref(), {"signals": merge_latest(current, items),
+                                           "updated": firestore.SERVER_TIMESTAMP})
+
+        write(db.transaction())
+
+    async def _write(self, items: list) -> bool:
+        """Commits `items` as one batch, retrying with exponential backoff. Returns False if every attempt failed."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await asyncio.to_thread(self._commit, items)
+                symbols = ", ".join(str(item["data"].get("symbol")) for item in items)
+                logger.info(f"Saved {len(items)} signal(s) to database: {symbols}.")
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to save {len(items)} signal(s) to Firestore "
+                               f"(attempt {attempt}/{self.max_attempts}): {e}")
+                if attempt < self.max_attempts:
+                    delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        return False
+
+    def _spill(self, items: list) -> None:
+        with open(self.spill_path, "a") as f:
+            for item in items:
+                f.write(json.dumps(item) + "\n")
+        logger.warning(f"Spilled {len(items)} signal(s) to {self.spill_path}.")
+
+    async def _replay(self) -> None:
+        """Writes previously spilled signals. Whatever still fails goes back to the spill file."""
+        replaying = self.spill_path + ".replay"
+        if os.path.exists(self.spill_path):
+            # Move the spill aside so signals spilled during the replay land in a fresh file
+            with open(self.spill_path) as src, open(replaying, "a") as dst:
+                dst.write(src.read())
+            os.remove(self.spill_path)
+        if not os.path.exists(replaying):
+            return
+
+        items = []
+        with open(replaying) as f:
+            for line in f:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping a corrupt line in {replaying}.")
+
+        logger.info(f"Replaying {len(items)} spilled signal(s).")
+        for lo in range(0, len(items), MAX_BATCH_WRITES):
+            if not await self._write(items[lo:lo + MAX_BATCH_WRITES]):
+                self._spill(items[lo:])
+                break
+        os.remove(replaying)
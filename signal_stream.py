@@ -0,0 +1,108 @@
+#
+#  --- Live Signal Stream ---
+#
+#  Server-Sent Events for new signals. Each web process has one SignalBroker, fed by the
+#  latest-signals listener, that fans every new signal out to all connected clients.
+#  Events live in a single ring buffer and each client only keeps a cursor into it, so an
+#  idle connection costs one waiting greenlet (gunicorn's gevent worker, see gunicorn.conf.py)
+#  and no queue of its own. Streams are capped below WEB_CONNECTIONS so ordinary page
+#  requests always find a free connection slot. Publishing never
+#  waits on clients: a client that falls further behind than the buffer (or resumes
+#  from an unknown Last-Event-ID) gets a `resync` event with the current latest signals.
+#
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from latest_signals import latest_signals
+
+SSE_BUFFER = 256  # Events kept for Last-Event-ID resume and slow clients
+SSE_HEARTBEAT = 15  # Seconds of silence before a keep-alive comment is sent
+SSE_MAX_AGE = 600  # Seconds before a connection is closed; the browser reconnects with Last-Event-ID
+WEB_CONNECTIONS = int(os.getenv("WEB_CONNECTIONS", "2000"))  # gevent connections per web process, see gunicorn.conf.py
+SSE_RESERVED_CONNECTIONS = 100  # Connections always left for non-stream requests
+# Open streams per web process, never more than WEB_CONNECTIONS - SSE_RESERVED_CONNECTIONS
+SSE_MAX_CLIENTS = min(int(os.getenv("SSE_MAX_CLIENTS", str(WEB_CONNECTIONS - SSE_RESERVED_CONNECTIONS))),
+                      max(WEB_CONNECTIONS - SSE_RESERVED_CONNECTIONS, 1))
+
+
+def format_event(event: str, data: str, event_id: str | None = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {data}"]
+    return "\n".join(lines) + "\n\n"
+
+
+class SignalBroker:
+    """In-process fan-out of new signals to Server-Sent Events streams."""
+
+    def __init__(self, size: int = SSE_BUFFER, max_clients: int = SSE_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self.clients = 0
+        self._events = deque(maxlen=size)  # (sequence, signal id, JSON data)
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    def publish(self, signals: list) -> None:
+        with self._condition:
+            for signal in signals:
+                self._sequence += 1
+                self._events.append((self._sequence, signal.get("id"), json.dumps(signal, default=str)))
+            self._condition.notify_all()
+
+    def connect(self) -> bool:
+        """Reserves a client slot; False when the process already serves `max_clients` streams."""
+        with self._condition:
+            if self.clients >= self.max_clients:
+                return False
+            self.clients += 1
+            return True
+
+    def disconnect(self) -> None:
+        with self._condition:
+            self.clients -= 1
+
+    def _resume(self, last_event_id: str | None) -> tuple:
+        """Returns: (sequence to continue after, whether the client needs a resync)."""
+        with self._condition:
+            if not last_event_id:
+                return self._sequence, False
+            for sequence, event_id, _ in self._events:
+                if event_id == last_event_id:
+                    return sequence, False
+            return self._sequence, True
+
+    def _wait(self, cursor: int, timeout: float) -> tuple:
+        """Waits up to `timeout` for events after `cursor`. Returns: (events, whether some were missed)."""
+        with self._condition:
+            if self._sequence == cursor:
+                self._condition.wait(timeout)
+            events = [event for event in self._events if event[0] > cursor]
+            missed = bool(events) and events[0][0] > cursor + 1
+            return events, missed
+
+    def stream(self, last_event_id: str | None = None, heartbeat: float = SSE_HEARTBEAT,
+               max_age: float = SSE_MAX_AGE):
+        """Yields the text of an event stream for one client until `max_age` has passed."""
+        yield "retry: 5000\n\n"
+        cursor, resync = self._resume(last_event_id)
+        if resync:
+            yield format_event("resync", json.dumps(latest_signals.get()[0], default=str))
+
+        closes_at = time.monotonic() + max_age
+        while time.monotonic() < closes_at:
+            events, missed = self._wait(cursor, heartbeat)
+            if missed:
+                yield format_event("resync", json.dumps(latest_signals.get()[0], default=str))
+            if not events:
+                yield ": heartbeat\n\n"
+                continue
+            for sequence, event_id, data in events:
+                yield format_event("signal", data, event_id)
+                cursor = sequence
+
+
+signal_broker = SignalBroker()
+latest_signals.add_listener(signal_broker.publish)
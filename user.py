@@ -1,8 +1,57 @@
 from flask_login import UserMixin
 import firestore_config
+import copy
+import os
+import threading
+from cachetools import TTLCache
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Invalidation is per process, so other web workers may serve a changed user for up to this long
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+
+class UserCache:
+    """Bounded TTL + LRU cache of User objects keyed by uid, with hit/miss counters."""
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, uid: str) -> Optional["User"]:
+        with self._lock:
+            user = self._users.get(uid)
+            if user is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return copy.copy(user)  # callers may modify their copy before saving
+
+    def put(self, user: "User") -> None:
+        with self._lock:
+            self._users[user.id] = copy.copy(user)
+
+    def invalidate(self, uid: str) -> None:
+        with self._lock:
+            self._users.pop(uid, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._users),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
+
+
 class User(UserMixin):
     def __init__(
         self,
@@ -20,12 +69,18 @@ class User(UserMixin):
         self.paid_until = data.get("paid_until")  # Keep for compatibility
 
     @classmethod
-    def get(cls, uid: str) -> Optional["User"]:
-        """Load a User by UID from Firestore, or return None if not found."""
+    def get(cls, uid: str, cached: bool = True) -> Optional["User"]:
+        """Load a User by UID (from the cache unless `cached` is False), or return None if not found."""
+        if cached:
+            user = user_cache.get(uid)
+            if user is not None:
+                return user
         doc = firestore_config.db.collection("users").document(uid).get()
         if not doc.exists:
             return None
-        return cls(uid, doc.to_dict())
+        user = cls(uid, doc.to_dict())
+        user_cache.put(user)
+        return user
 
     def save(self) -> None:
         """Persist this User’s data back to Firestore."""
@@ -39,6 +94,7 @@ class User(UserMixin):
             "has_paid": self.has_paid,
             "paid_until": self.paid_until  # Keep for compatibility
         }, merge=True)
+        user_cache.invalidate(self.id)
 
     def code_valid(self) -> bool:
         """